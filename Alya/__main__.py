@@ -2,7 +2,6 @@ import asyncio
 import importlib
 import signal
 import sys
-from Alya.platforms.Youtube import initialize_module
 from pyrogram import idle
 from pytgcalls.exceptions import NoActiveGroupCall
 
@@ -12,6 +11,11 @@ from Alya.core.call import alya
 from Alya.misc import sudo
 from Alya.plugins import ALL_MODULES
 from Alya.utils.database import get_banned_users, get_gbanned
+from Alya.utils.http_client import close_session
+from Alya.utils.mediacache import start_media_cache, stop_media_cache
+from Alya.utils.stream.snapshot import start_snapshots, stop_snapshots
+from Alya.utils.tracing import start_lag_monitor
+from Alya.utils.ytdlp_pool import close_pool
 from config import BANNED_USERS
 
 
@@ -26,13 +30,7 @@ async def shutdown(signal, loop):
 
 
 async def init():
-    if (
-        not config.STRING1
-        and not config.STRING2
-        and not config.STRING3
-        and not config.STRING4
-        and not config.STRING5
-    ):
+    if not config.STRING_SESSIONS:
         LOGGER(__name__).error("Assistant session not filled, please fill a Pyrogram session...")
         exit()
     await sudo()
@@ -46,6 +44,8 @@ async def init():
     except:
         pass
     await app.start()
+    start_media_cache()
+    start_lag_monitor()
     for all_module in ALL_MODULES:
         importlib.import_module("Alya.plugins" + all_module)
     LOGGER("Alya.plugins").info("Annie's modules loaded...")
@@ -61,10 +61,14 @@ async def init():
     except:
         pass
     await alya.decorators()
+    start_snapshots()
     LOGGER("Alya").info("Annie Started Successfully...")
     await idle()
+    await stop_snapshots()
+    await close_session()
+    await close_pool()
     await app.stop()  
-    await initialize_module()
+    await stop_media_cache()
     await userbot.stop()
     LOGGER("Alya").info("Stopping Annie Bot ...")
 
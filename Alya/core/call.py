@@ -1,5 +1,6 @@
 import asyncio
-import os
+import time
+from collections import deque
 from datetime import datetime, timedelta
 from typing import Union
 
@@ -17,11 +18,15 @@ from pytgcalls.types.input_stream.quality import HighQualityAudio, MediumQuality
 from pytgcalls.types.stream import StreamAudioEnded
 
 import config
-from Alya import YouTube, app
+from Alya import YouTube, app, userbot
+from Alya.platforms.Telegram import growing_params
+from Alya.core.fanout import fan_out
+from Alya.core.userbot import NAMES, assistants, unavailable
 from Alya.misc import db
 from Alya.utils.database import (
     add_active_chat,
     add_active_video_chat,
+    assistantdict,
     get_lang,
     get_loop,
     group_assistant,
@@ -31,15 +36,36 @@ from Alya.utils.database import (
     remove_active_video_chat,
     set_loop,
 )
-from Alya.utils.exceptions import AssistantErr
+from Alya.utils.exceptions import AssistantErr, ChatBusy
+from Alya.utils.fileid_cache import send_photo
 from Alya.utils.formatters import check_duration, seconds_to_min, speed_converter
 from Alya.utils.inline.play import stream_markup
-from Alya.utils.stream.autoclear import auto_clean
+from Alya.utils.placement import call_ended, call_started, join_failed
+from Alya.utils.stream.autoclear import (
+    auto_clean,
+    release,
+    release_entry,
+    set_entry_path,
+)
+from Alya.utils.stream.chatlock import chat_lock
+from Alya.utils.stream.lazy import cancel_resolve, resolve_head
+from Alya.utils.stream.model import ChatQueue
+from Alya.utils.stream.speedcache import get_speed_variant, prerender_variants
+from Alya.utils.stream.prefetch import (
+    cancel_prefetch,
+    get_prefetched,
+    schedule_prefetch,
+)
 from Alya.utils.thumbnails import get_thumb
 from strings import get_string
 
 autoend = {}
 counter = {}
+speed_latency = {"live": deque(maxlen=50), "render": deque(maxlen=50)}
+remote_streams = {}
+
+RECONNECT_PARAMS = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+EARLY_END_MARGIN = 15
 
 import logging
 
@@ -51,64 +77,42 @@ logging.basicConfig(
 
 LOGGER = logging.getLogger(__name__)
 
+def remote(link) -> bool:
+    return str(link).startswith(("http://", "https://"))
+
+
+def input_params(link) -> str:
+    return RECONNECT_PARAMS if remote(link) else growing_params(link)
+
+
 async def _clear_(chat_id):
-    db[chat_id] = []
+    remote_streams.pop(chat_id, None)
+    cancel_resolve(chat_id)
+    for entry in db.get(chat_id) or []:
+        release_entry(entry)
+    db[chat_id] = ChatQueue()
+    cancel_prefetch(chat_id)
+    call_ended(chat_id)
     await remove_active_video_chat(chat_id)
     await remove_active_chat(chat_id)
 
 
 class Call(PyTgCalls):
     def __init__(self):
-        self.userbot1 = Client(
-            name="AviaxAss1",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING1),
-        )
-        self.one = PyTgCalls(
-            self.userbot1,
-            cache_duration=100,
-        )
-        self.userbot2 = Client(
-            name="AviaxAss2",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING2),
-        )
-        self.two = PyTgCalls(
-            self.userbot2,
-            cache_duration=100,
-        )
-        self.userbot3 = Client(
-            name="AviaxAss3",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING3),
-        )
-        self.three = PyTgCalls(
-            self.userbot3,
-            cache_duration=100,
-        )
-        self.userbot4 = Client(
-            name="AviaxAss4",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING4),
-        )
-        self.four = PyTgCalls(
-            self.userbot4,
-            cache_duration=100,
-        )
-        self.userbot5 = Client(
-            name="AviaxAss5",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING5),
-        )
-        self.five = PyTgCalls(
-            self.userbot5,
-            cache_duration=100,
-        )
+        self.calls = {}
+        for number, session in config.STRING_SESSIONS.items():
+            client = Client(
+                name=f"AviaxAss{number}",
+                api_id=config.API_ID,
+                api_hash=config.API_HASH,
+                session_string=str(session),
+            )
+            self.calls[number] = PyTgCalls(
+                client,
+                cache_duration=100,
+            )
+        for number, name in enumerate(NAMES, 1):
+            setattr(self, name, self.calls.get(number))
 
     async def pause_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
@@ -120,99 +124,73 @@ class Call(PyTgCalls):
 
     async def stop_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
-        try:
-            await _clear_(chat_id)
-            await assistant.leave_group_call(chat_id)
-        except:
-            pass
+        async with chat_lock(chat_id):
+            try:
+                await _clear_(chat_id)
+                await assistant.leave_group_call(chat_id)
+            except:
+                pass
 
     async def stop_stream_force(self, chat_id: int):
-        try:
-            if config.STRING1:
-                await self.one.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING2:
-                await self.two.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING3:
-                await self.three.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING4:
-                await self.four.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            if config.STRING5:
-                await self.five.leave_group_call(chat_id)
-        except:
-            pass
-        try:
-            await _clear_(chat_id)
-        except:
-            pass
+        async with chat_lock(chat_id):
+            await fan_out(
+                self.started_calls(),
+                lambda assistant: assistant.leave_group_call(chat_id),
+                config.FANOUT_TIMEOUT,
+            )
+            try:
+                await _clear_(chat_id)
+            except:
+                pass
 
     async def speedup_stream(self, chat_id: int, file_path, speed, playing):
+        start = time.perf_counter()
+        mode = "render"
+        if config.SPEED_MODE == "live":
+            try:
+                async with chat_lock(chat_id):
+                    await self.speedup_stream_live(chat_id, file_path, speed, playing)
+                mode = "live"
+            except (AssistantErr, ChatBusy):
+                raise
+            except Exception as e:
+                LOGGER.warning(f"Live speed change failed in {chat_id}: {e}")
+        if mode == "render":
+            await self.speedup_stream_render(chat_id, file_path, speed, playing)
+        latency = round(time.perf_counter() - start, 3)
+        speed_latency[mode].append(latency)
+        LOGGER.info(f"Speed {speed}x applied in {chat_id} via {mode} in {latency}s")
+
+    async def speedup_stream_live(self, chat_id: int, file_path, speed, playing):
         assistant = await group_assistant(self, chat_id)
-        if str(speed) != str("1.0"):
-            base = os.path.basename(file_path)
-            chatdir = os.path.join(os.getcwd(), "playback", str(speed))
-            if not os.path.isdir(chatdir):
-                os.makedirs(chatdir)
-            out = os.path.join(chatdir, base)
-            if not os.path.isfile(out):
-                if str(speed) == str("0.5"):
-                    vs = 2.0
-                if str(speed) == str("0.75"):
-                    vs = 1.35
-                if str(speed) == str("1.5"):
-                    vs = 0.68
-                if str(speed) == str("2.0"):
-                    vs = 0.5
-                proc = await asyncio.create_subprocess_shell(
-                    cmd=(
-                        "ffmpeg "
-                        "-i "
-                        f"{file_path} "
-                        "-filter:v "
-                        f"setpts={vs}*PTS "
-                        "-filter:a "
-                        f"atempo={speed} "
-                        f"{out}"
-                    ),
-                    stdin=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                )
-                await proc.communicate()
-            else:
-                pass
-        else:
-            out = file_path
-        dur = await asyncio.get_event_loop().run_in_executor(None, check_duration, out)
-        dur = int(dur)
-        played, con_seconds = speed_converter(playing[0]["played"], speed)
-        duration = seconds_to_min(dur)
+        total = await asyncio.get_event_loop().run_in_executor(
+            None, check_duration, file_path
+        )
+        total = int(total)
+        rate = float(speed)
+        position = int(int(playing[0]["played"]) * float(playing[0].get("speed") or 1.0))
+        params = f"-ss {position} -to {total}"
+        if rate != 1.0:
+            params += f" -atmid -filter:a atempo={rate}"
+            if playing[0]["streamtype"] == "video":
+                params += f" -filter:v setpts={round(1 / rate, 4)}*PTS"
         stream = (
             AudioVideoPiped(
-                out,
+                file_path,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
-                additional_ffmpeg_parameters=f"-ss {played} -to {duration}",
+                additional_ffmpeg_parameters=params,
             )
             if playing[0]["streamtype"] == "video"
             else AudioPiped(
-                out,
+                file_path,
                 audio_parameters=HighQualityAudio(),
-                additional_ffmpeg_parameters=f"-ss {played} -to {duration}",
+                additional_ffmpeg_parameters=params,
             )
         )
         if str(db[chat_id][0]["file"]) == str(file_path):
             await assistant.change_stream(chat_id, stream)
+            remote_streams.pop(chat_id, None)
         else:
             raise AssistantErr("Umm")
         if str(db[chat_id][0]["file"]) == str(file_path):
@@ -220,25 +198,69 @@ class Call(PyTgCalls):
             if not exis:
                 db[chat_id][0]["old_dur"] = db[chat_id][0]["dur"]
                 db[chat_id][0]["old_second"] = db[chat_id][0]["seconds"]
-            db[chat_id][0]["played"] = con_seconds
-            db[chat_id][0]["dur"] = duration
+            dur = int(total / rate)
+            db[chat_id][0]["played"] = int(position / rate)
+            db[chat_id][0]["dur"] = seconds_to_min(dur)
             db[chat_id][0]["seconds"] = dur
-            db[chat_id][0]["speed_path"] = out
+            set_entry_path(db[chat_id][0], "speed_path", file_path)
             db[chat_id][0]["speed"] = speed
 
+    async def speedup_stream_render(self, chat_id: int, file_path, speed, playing):
+        assistant = await group_assistant(self, chat_id)
+        if str(speed) != str("1.0"):
+            out = await get_speed_variant(file_path, speed)
+        else:
+            out = file_path
+        async with chat_lock(chat_id):
+            dur = await asyncio.get_event_loop().run_in_executor(None, check_duration, out)
+            dur = int(dur)
+            played, con_seconds = speed_converter(playing[0]["played"], speed)
+            duration = seconds_to_min(dur)
+            stream = (
+                AudioVideoPiped(
+                    out,
+                    audio_parameters=HighQualityAudio(),
+                    video_parameters=MediumQualityVideo(),
+                    additional_ffmpeg_parameters=f"-ss {played} -to {duration}",
+                )
+                if playing[0]["streamtype"] == "video"
+                else AudioPiped(
+                    out,
+                    audio_parameters=HighQualityAudio(),
+                    additional_ffmpeg_parameters=f"-ss {played} -to {duration}",
+                )
+            )
+            if str(db[chat_id][0]["file"]) == str(file_path):
+                await assistant.change_stream(chat_id, stream)
+                remote_streams.pop(chat_id, None)
+            else:
+                raise AssistantErr("Umm")
+            if str(db[chat_id][0]["file"]) == str(file_path):
+                exis = (playing[0]).get("old_dur")
+                if not exis:
+                    db[chat_id][0]["old_dur"] = db[chat_id][0]["dur"]
+                    db[chat_id][0]["old_second"] = db[chat_id][0]["seconds"]
+                db[chat_id][0]["played"] = con_seconds
+                db[chat_id][0]["dur"] = duration
+                db[chat_id][0]["seconds"] = dur
+                set_entry_path(db[chat_id][0], "speed_path", out)
+                db[chat_id][0]["speed"] = speed
+
     async def force_stop_stream(self, chat_id: int):
         assistant = await group_assistant(self, chat_id)
-        try:
-            check = db.get(chat_id)
-            check.pop(0)
-        except:
-            pass
-        await remove_active_video_chat(chat_id)
-        await remove_active_chat(chat_id)
-        try:
-            await assistant.leave_group_call(chat_id)
-        except:
-            pass
+        async with chat_lock(chat_id):
+            try:
+                check = db.get(chat_id)
+                release_entry(check.popleft())
+            except:
+                pass
+            call_ended(chat_id)
+            await remove_active_video_chat(chat_id)
+            await remove_active_chat(chat_id)
+            try:
+                await assistant.leave_group_call(chat_id)
+            except:
+                pass
 
     async def skip_stream(
         self,
@@ -246,6 +268,7 @@ class Call(PyTgCalls):
         link: str,
         video: Union[bool, str] = None,
         image: Union[bool, str] = None,
+        vidid: Union[bool, str] = None,
     ):
         assistant = await group_assistant(self, chat_id)
         if video:
@@ -253,13 +276,32 @@ class Call(PyTgCalls):
                 link,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
+                additional_ffmpeg_parameters=input_params(link),
             )
         else:
-            stream = AudioPiped(link, audio_parameters=HighQualityAudio())
-        await assistant.change_stream(
-            chat_id,
-            stream,
-        )
+            stream = AudioPiped(
+                link,
+                audio_parameters=HighQualityAudio(),
+                additional_ffmpeg_parameters=input_params(link),
+            )
+        async with chat_lock(chat_id):
+            await assistant.change_stream(
+                chat_id,
+                stream,
+            )
+            if vidid is None and remote(link):
+                check = db.get(chat_id)
+                if check and "vid_" in str(check[0]["file"]):
+                    vidid = check[0]["vidid"]
+            if remote(link) and vidid:
+                remote_streams[chat_id] = {
+                    "vidid": vidid,
+                    "video": bool(video),
+                    "started_at": time.time(),
+                }
+            else:
+                remote_streams.pop(chat_id, None)
+            schedule_prefetch(chat_id)
 
     async def seek_stream(self, chat_id, file_path, to_seek, duration, mode):
         assistant = await group_assistant(self, chat_id)
@@ -277,7 +319,9 @@ class Call(PyTgCalls):
                 additional_ffmpeg_parameters=f"-ss {to_seek} -to {duration}",
             )
         )
-        await assistant.change_stream(chat_id, stream)
+        async with chat_lock(chat_id):
+            await assistant.change_stream(chat_id, stream)
+            remote_streams.pop(chat_id, None)
 
     async def stream_call(self, link):
         assistant = await group_assistant(self, config.LOG_GROUP_ID)
@@ -296,15 +340,21 @@ class Call(PyTgCalls):
         link,
         video: Union[bool, str] = None,
         image: Union[bool, str] = None,
+        vidid: Union[bool, str] = None,
+        seek: int = None,
     ):
         assistant = await group_assistant(self, chat_id)
         language = await get_lang(chat_id)
         _ = get_string(language)
+        params = input_params(link)
+        if seek:
+            params = f"-ss {seek} {params}".strip()
         if video:
             stream = AudioVideoPiped(
                 link,
                 audio_parameters=HighQualityAudio(),
                 video_parameters=MediumQualityVideo(),
+                additional_ffmpeg_parameters=params,
             )
         else:
             stream = (
@@ -314,7 +364,11 @@ class Call(PyTgCalls):
                     video_parameters=MediumQualityVideo(),
                 )
                 if video
-                else AudioPiped(link, audio_parameters=HighQualityAudio())
+                else AudioPiped(
+                    link,
+                    audio_parameters=HighQualityAudio(),
+                    additional_ffmpeg_parameters=params,
+                )
             )
         try:
             await assistant.join_group_call(
@@ -327,7 +381,30 @@ class Call(PyTgCalls):
         except AlreadyJoinedError:
             raise AssistantErr(_["call_9"])
         except TelegramServerError:
+            join_failed(assistantdict.get(chat_id))
             raise AssistantErr(_["call_10"])
+        except Exception as e:
+            if not (remote(link) and vidid):
+                raise
+            LOGGER.warning(f"Direct stream of {vidid} did not start ({e}), downloading it")
+            link, _direct = await YouTube.download(
+                vidid, None, videoid=True, video=video, local=True, chat_id=chat_id
+            )
+            if not link:
+                raise AssistantErr(_["call_10"])
+            return await self.join_call(
+                chat_id, original_chat_id, link, video, image, seek=seek
+            )
+        if remote(link) and vidid:
+            remote_streams[chat_id] = {
+                "vidid": vidid,
+                "video": bool(video),
+                "started_at": time.time() - (seek or 0),
+            }
+        else:
+            remote_streams.pop(chat_id, None)
+        call_started(assistantdict.get(chat_id), chat_id, bool(video))
+        prerender_variants(link)
         await add_active_chat(chat_id)
         await music_on(chat_id)
         if video:
@@ -339,12 +416,65 @@ class Call(PyTgCalls):
                 autoend[chat_id] = datetime.now() + timedelta(minutes=1)
 
     async def change_stream(self, client, chat_id):
+        async with chat_lock(chat_id):
+            await self._change_stream(client, chat_id)
+
+    async def _resume_locally(self, client, chat_id) -> bool:
+        """A direct URL stream that ends well before the track does has
+        stalled: download the track and continue from where it stopped."""
+        stream_info = remote_streams.pop(chat_id, None)
+        check = db.get(chat_id)
+        if not stream_info or not check:
+            return False
+        elapsed = int(time.time() - stream_info["started_at"])
+        if elapsed >= int(check[0].get("seconds") or 0) - EARLY_END_MARGIN:
+            return False
+        LOGGER.warning(
+            f"Direct stream of {stream_info['vidid']} ended after {elapsed}s in {chat_id}, "
+            "falling back to a download"
+        )
+        try:
+            file_path, _direct = await YouTube.download(
+                stream_info["vidid"],
+                None,
+                videoid=True,
+                video=stream_info["video"],
+                local=True,
+                chat_id=chat_id,
+            )
+            if not file_path:
+                return False
+            params = f"-ss {elapsed}"
+            stream = (
+                AudioVideoPiped(
+                    file_path,
+                    audio_parameters=HighQualityAudio(),
+                    video_parameters=MediumQualityVideo(),
+                    additional_ffmpeg_parameters=params,
+                )
+                if stream_info["video"]
+                else AudioPiped(
+                    file_path,
+                    audio_parameters=HighQualityAudio(),
+                    additional_ffmpeg_parameters=params,
+                )
+            )
+            await client.change_stream(chat_id, stream)
+        except Exception as e:
+            LOGGER.error(f"Local fallback for {stream_info['vidid']} failed: {e}")
+            return False
+        set_entry_path(check[0], "path", file_path)
+        return True
+
+    async def _change_stream(self, client, chat_id):
+        if await self._resume_locally(client, chat_id):
+            return
         check = db.get(chat_id)
         popped = None
         loop = await get_loop(chat_id)
         try:
             if loop == 0:
-                popped = check.pop(0)
+                popped = check.popleft()
             else:
                 loop = loop - 1
                 await set_loop(chat_id, loop)
@@ -359,6 +489,9 @@ class Call(PyTgCalls):
             except:
                 return
         else:
+            if not await resolve_head(chat_id):
+                await _clear_(chat_id)
+                return await client.leave_group_call(chat_id)
             queued = check[0]["file"]
             language = await get_lang(chat_id)
             _ = get_string(language)
@@ -372,9 +505,11 @@ class Call(PyTgCalls):
             if exis:
                 db[chat_id][0]["dur"] = exis
                 db[chat_id][0]["seconds"] = check[0]["old_second"]
-                db[chat_id][0]["speed_path"] = None
+                set_entry_path(db[chat_id][0], "speed_path", None)
                 db[chat_id][0]["speed"] = 1.0
             video = True if str(streamtype) == "video" else False
+            if "vid_" not in queued:
+                schedule_prefetch(chat_id)
             if "live_" in queued:
                 n, link = await YouTube.video(videoid, True)
                 if n == 0:
@@ -402,7 +537,7 @@ class Call(PyTgCalls):
                     )
                 img = await t(videoid)
                 button = stream_markup(_, chat_id)
-                run = await app.send_photo(
+                run = await send_photo(
                     chat_id=original_chat_id,
                     photo=img,
                     caption=_["stream_1"].format(
@@ -416,40 +551,69 @@ class Call(PyTgCalls):
                 db[chat_id][0]["mystic"] = run
                 db[chat_id][0]["markup"] = "tg"
             elif "vid_" in queued:
-                mystic = await app.send_message(original_chat_id, _["call_7"])
-                try:
-                    file_path, direct = await YouTube.download(
-                        videoid,
-                        mystic,
-                        videoid=True,
-                        video=True if str(streamtype) == "video" else False,
-                    )
-                except:
-                    return await mystic.edit_text(
-                        _["call_6"], disable_web_page_preview=True
-                    )
+                mystic = None
+                file_path = await get_prefetched(chat_id, videoid, video)
+                prefetched = file_path
+                if not file_path:
+                    mystic = await app.send_message(original_chat_id, _["call_7"])
+                    try:
+                        file_path, direct = await YouTube.download(
+                            videoid,
+                            mystic,
+                            videoid=True,
+                            video=True if str(streamtype) == "video" else False,
+                            chat_id=chat_id,
+                        )
+                    except:
+                        return await mystic.edit_text(
+                            _["call_6"], disable_web_page_preview=True
+                        )
+                set_entry_path(db[chat_id][0], "path", file_path)
+                release(prefetched)
                 if video:
                     stream = AudioVideoPiped(
                         file_path,
                         audio_parameters=HighQualityAudio(),
                         video_parameters=MediumQualityVideo(),
+                        additional_ffmpeg_parameters=input_params(file_path),
                     )
                 else:
                     stream = AudioPiped(
                         file_path,
                         audio_parameters=HighQualityAudio(),
+                        additional_ffmpeg_parameters=input_params(file_path),
                     )
                 try:
                     await client.change_stream(chat_id, stream)
                 except:
-                    return await app.send_message(
-                        original_chat_id,
-                        text=_["call_6"],
-                    )
+                    if not remote(file_path):
+                        return await app.send_message(
+                            original_chat_id,
+                            text=_["call_6"],
+                        )
+                    remote_streams[chat_id] = {
+                        "vidid": videoid,
+                        "video": video,
+                        "started_at": time.time(),
+                    }
+                    if not await self._resume_locally(client, chat_id):
+                        return await app.send_message(
+                            original_chat_id,
+                            text=_["call_6"],
+                        )
+                else:
+                    if remote(file_path):
+                        remote_streams[chat_id] = {
+                            "vidid": videoid,
+                            "video": video,
+                            "started_at": time.time(),
+                        }
+                prerender_variants(file_path)
                 img = await get_thumb(videoid)
                 button = stream_markup(_, chat_id)
-                await mystic.delete()
-                run = await app.send_photo(
+                if mystic:
+                    await mystic.delete()
+                run = await send_photo(
                     chat_id=original_chat_id,
                     photo=img,
                     caption=_["stream_1"].format(
@@ -480,7 +644,7 @@ class Call(PyTgCalls):
                         text=_["call_6"],
                     )
                 button = stream_markup(_, chat_id)
-                run = await app.send_photo(
+                run = await send_photo(
                     chat_id=original_chat_id,
                     photo=config.STREAM_IMG_URL,
                     caption=_["stream_2"].format(user),
@@ -494,11 +658,13 @@ class Call(PyTgCalls):
                         queued,
                         audio_parameters=HighQualityAudio(),
                         video_parameters=MediumQualityVideo(),
+                        additional_ffmpeg_parameters=input_params(queued),
                     )
                 else:
                     stream = AudioPiped(
                         queued,
                         audio_parameters=HighQualityAudio(),
+                        additional_ffmpeg_parameters=input_params(queued),
                     )
                 try:
                     await client.change_stream(chat_id, stream)
@@ -507,9 +673,10 @@ class Call(PyTgCalls):
                         original_chat_id,
                         text=_["call_6"],
                     )
+                prerender_variants(queued)
                 if videoid == "telegram":
                     button = stream_markup(_, chat_id)
-                    run = await app.send_photo(
+                    run = await send_photo(
                         chat_id=original_chat_id,
                         photo=config.TELEGRAM_AUDIO_URL
                         if str(streamtype) == "audio"
@@ -523,7 +690,7 @@ class Call(PyTgCalls):
                     db[chat_id][0]["markup"] = "tg"
                 elif videoid == "soundcloud":
                     button = stream_markup(_, chat_id)
-                    run = await app.send_photo(
+                    run = await send_photo(
                         chat_id=original_chat_id,
                         photo=config.SOUNCLOUD_IMG_URL,
                         caption=_["stream_1"].format(
@@ -536,7 +703,7 @@ class Call(PyTgCalls):
                 else:
                     img = await get_thumb(videoid)
                     button = stream_markup(_, chat_id)
-                    run = await app.send_photo(
+                    run = await send_photo(
                         chat_id=original_chat_id,
                         photo=img,
                         caption=_["stream_1"].format(
@@ -550,62 +717,59 @@ class Call(PyTgCalls):
                     db[chat_id][0]["mystic"] = run
                     db[chat_id][0]["markup"] = "stream"
 
+    def started_calls(self) -> dict:
+        return {number: self.calls[number] for number in assistants}
+
     async def ping(self):
-        pings = []
-        if config.STRING1:
-            pings.append(await self.one.ping)
-        if config.STRING2:
-            pings.append(await self.two.ping)
-        if config.STRING3:
-            pings.append(await self.three.ping)
-        if config.STRING4:
-            pings.append(await self.four.ping)
-        if config.STRING5:
-            pings.append(await self.five.ping)
+        async def _ping(assistant):
+            return await assistant.ping
+
+        results = await fan_out(self.started_calls(), _ping, config.FANOUT_TIMEOUT)
+        pings = [x for x in results.values() if not isinstance(x, BaseException)]
+        if not pings:
+            return "0"
         return str(round(sum(pings) / len(pings), 3))
 
     async def start(self):
         LOGGER.info("Starting PyTgCalls Client...\n")
-
-        if config.STRING1:
-            await self.one.start()
-        if config.STRING2:
-            await self.two.start()
-        if config.STRING3:
-            await self.three.start()
-        if config.STRING4:
-            await self.four.start()
-        if config.STRING5:
-            await self.five.start()
+        started = time.perf_counter()
+        results = await fan_out(
+            self.started_calls(),
+            lambda assistant: assistant.start(),
+            config.ASSISTANT_START_TIMEOUT,
+        )
+        for number, result in results.items():
+            if isinstance(result, BaseException):
+                await userbot.drop_assistant(number)
+                unavailable[number] = type(result).__name__
+                LOGGER.error(
+                    f"PyTgCalls for assistant {number} is unavailable ({type(result).__name__})"
+                )
+        LOGGER.info(
+            f"PyTgCalls started for {len(assistants)}/{len(results)} assistants in "
+            f"{round(time.perf_counter() - started, 2)}s"
+        )
 
     async def decorators(self):
-        @self.one.on_kicked()
-        @self.two.on_kicked()
-        @self.three.on_kicked()
-        @self.four.on_kicked()
-        @self.five.on_kicked()
-        @self.one.on_closed_voice_chat()
-        @self.two.on_closed_voice_chat()
-        @self.three.on_closed_voice_chat()
-        @self.four.on_closed_voice_chat()
-        @self.five.on_closed_voice_chat()
-        @self.one.on_left()
-        @self.two.on_left()
-        @self.three.on_left()
-        @self.four.on_left()
-        @self.five.on_left()
         async def stream_services_handler(_, chat_id: int):
-            await self.stop_stream(chat_id)
+            try:
+                await self.stop_stream(chat_id)
+            except ChatBusy as e:
+                LOGGER.warning(f"Dropped call update: {e}")
 
-        @self.one.on_stream_end()
-        @self.two.on_stream_end()
-        @self.three.on_stream_end()
-        @self.four.on_stream_end()
-        @self.five.on_stream_end()
         async def stream_end_handler1(client, update: Update):
             if not isinstance(update, StreamAudioEnded):
                 return
-            await self.change_stream(client, update.chat_id)
+            try:
+                await self.change_stream(client, update.chat_id)
+            except ChatBusy as e:
+                LOGGER.warning(f"Dropped stream end: {e}")
+
+        for assistant in self.calls.values():
+            assistant.on_kicked()(stream_services_handler)
+            assistant.on_closed_voice_chat()(stream_services_handler)
+            assistant.on_left()(stream_services_handler)
+            assistant.on_stream_end()(stream_end_handler1)
 
 
 alya = Call()
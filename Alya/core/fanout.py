@@ -0,0 +1,25 @@
+import asyncio
+
+
+async def fan_out(clients: dict, func, timeout: float) -> dict:
+    """Run ``func(client)`` for every client at once under one shared
+    deadline and return ``{number: result}``, where a failed or timed out
+    assistant maps to its exception."""
+    tasks = {
+        number: asyncio.ensure_future(func(client))
+        for number, client in clients.items()
+    }
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+    for task in pending:
+        task.cancel()
+    results = {}
+    for number, task in tasks.items():
+        if task in pending:
+            results[number] = asyncio.TimeoutError()
+        elif task.exception():
+            results[number] = task.exception()
+        else:
+            results[number] = task.result()
+    return results
@@ -1,172 +1,126 @@
+import asyncio
+import time
 
 from pyrogram import Client
 
 import config
+from Alya.core.fanout import fan_out
 
 from ..logging import LOGGER
 
 assistants = []
 assistantids = []
+unavailable = {}
+
+NAMES = ["one", "two", "three", "four", "five"]
 
 
 class Userbot(Client):
     def __init__(self):
-        self.one = Client(
-            name="AviaxAss1",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING1),
-            no_updates=True,
-        )
-        self.two = Client(
-            name="AviaxAss2",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING2),
-            no_updates=True,
-        )
-        self.three = Client(
-            name="AviaxAss3",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING3),
-            no_updates=True,
-        )
-        self.four = Client(
-            name="AviaxAss4",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING4),
-            no_updates=True,
-        )
-        self.five = Client(
-            name="AviaxAss5",
-            api_id=config.API_ID,
-            api_hash=config.API_HASH,
-            session_string=str(config.STRING5),
-            no_updates=True,
-        )
+        self.clients = {}
+        for number, session in config.STRING_SESSIONS.items():
+            self.clients[number] = Client(
+                name=f"AviaxAss{number}",
+                api_id=config.API_ID,
+                api_hash=config.API_HASH,
+                session_string=str(session),
+                no_updates=True,
+            )
+        for number, name in enumerate(NAMES, 1):
+            setattr(self, name, self.clients.get(number))
 
     async def start(self):
         LOGGER(__name__).info(f"Starting Assistants...")
-        if config.STRING1:
-            await self.one.start()
-            try:
-                await self.one.join_chat("Shadowbotshq")
-                await self.one.join_chat("Shadowbotssupport")
-            except:
-                pass
-            assistants.append(1)
-            try:
-                await self.one.send_message("@Shadowbotssupport", "Assistant Started")
-            except:
-                LOGGER(__name__).error(
-                    "Assistant Account 1 has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin!"
-                )
-                exit()
-            self.one.id = self.one.me.id
-            self.one.name = self.one.me.mention
-            self.one.username = self.one.me.username
-            assistantids.append(self.one.id)
-            LOGGER(__name__).info(f"Assistant Started as {self.one.name}")
-
-        if config.STRING2:
-            await self.two.start()
-            try:
-                await self.two.join_chat("AviaxOfficial")
-                await self.one.join_chat("AviaxSupport")
-            except:
-                pass
-            assistants.append(2)
-            try:
-                await self.two.send_message(config.LOG_GROUP_ID, "Assistant Started")
-            except:
-                LOGGER(__name__).error(
-                    "Assistant Account 2 has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin!"
+        started = time.perf_counter()
+        numbers = list(self.clients)
+        timings = await asyncio.gather(
+            *(
+                self.start_assistant(number, client)
+                for number, client in self.clients.items()
+            )
+        )
+        assistants.sort()
+        for number, timing in zip(numbers, timings):
+            if timing:
+                LOGGER(__name__).info(
+                    f"Assistant {number} timings: "
+                    + ", ".join(f"{k} {v}s" for k, v in timing.items())
                 )
-                exit()
-            self.two.id = self.two.me.id
-            self.two.name = self.two.me.mention
-            self.two.username = self.two.me.username
-            assistantids.append(self.two.id)
-            LOGGER(__name__).info(f"Assistant Two Started as {self.two.name}")
+        LOGGER(__name__).info(
+            f"{len(assistants)}/{len(numbers)} assistants started in "
+            f"{round(time.perf_counter() - started, 2)}s"
+        )
+        if not assistants:
+            LOGGER(__name__).error("No assistant could be started, stopping...")
+            exit()
 
-        if config.STRING3:
-            await self.three.start()
-            try:
-                await self.three.join_chat("AviaxOfficial")
-                await self.one.join_chat("AviaxSupport")
-            except:
-                pass
-            assistants.append(3)
-            try:
-                await self.three.send_message(config.LOG_GROUP_ID, "Assistant Started")
-            except:
-                LOGGER(__name__).error(
-                    "Assistant Account 3 has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin! "
-                )
-                exit()
-            self.three.id = self.three.me.id
-            self.three.name = self.three.me.mention
-            self.three.username = self.three.me.username
-            assistantids.append(self.three.id)
-            LOGGER(__name__).info(f"Assistant Three Started as {self.three.name}")
+    async def start_assistant(self, number: int, client: Client):
+        timing = {}
+        try:
+            await asyncio.wait_for(
+                self.boot_assistant(number, client, timing),
+                config.ASSISTANT_START_TIMEOUT,
+            )
+        except Exception as e:
+            unavailable[number] = type(e).__name__
+            LOGGER(__name__).error(
+                f"Assistant {number} is unavailable ({type(e).__name__}), continuing without it."
+            )
+            await self.drop_assistant(number)
+            return timing
+        assistants.append(number)
+        assistantids.append(client.id)
+        LOGGER(__name__).info(f"Assistant {number} Started as {client.name}")
+        return timing
 
-        if config.STRING4:
-            await self.four.start()
-            try:
-                await self.four.join_chat("AviaxOfficial")
-                await self.one.join_chat("AviaxSupport")
-            except:
-                pass
-            assistants.append(4)
-            try:
-                await self.four.send_message(config.LOG_GROUP_ID, "Assistant Started")
-            except:
-                LOGGER(__name__).error(
-                    "Assistant Account 4 has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin! "
-                )
-                exit()
-            self.four.id = self.four.me.id
-            self.four.name = self.four.me.mention
-            self.four.username = self.four.me.username
-            assistantids.append(self.four.id)
-            LOGGER(__name__).info(f"Assistant Four Started as {self.four.name}")
+    async def boot_assistant(self, number: int, client: Client, timing: dict):
+        mark = time.perf_counter()
+        await client.start()
+        timing["start"] = round(time.perf_counter() - mark, 2)
+        mark = time.perf_counter()
+        try:
+            await client.join_chat("Shadowbotshq")
+            await client.join_chat("Shadowbotssupport")
+        except:
+            pass
+        timing["join"] = round(time.perf_counter() - mark, 2)
+        mark = time.perf_counter()
+        try:
+            await client.send_message("@Shadowbotssupport", "Assistant Started")
+        except:
+            LOGGER(__name__).error(
+                f"Assistant Account {number} has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin!"
+            )
+            raise
+        timing["log"] = round(time.perf_counter() - mark, 2)
+        client.id = client.me.id
+        client.name = client.me.mention
+        client.username = client.me.username
 
-        if config.STRING5:
-            await self.five.start()
-            try:
-                await self.five.join_chat("AviaxOfficial")
-                await self.one.join_chat("AviaxSupport")
-            except:
-                pass
-            assistants.append(5)
+    async def drop_assistant(self, number: int):
+        """Forget an assistant that could not be brought up, disconnecting
+        whatever part of its client did start."""
+        if number in assistants:
+            assistants.remove(number)
+        client = self.clients.pop(number, None)
+        if client is None:
+            return
+        if getattr(client, "id", None) in assistantids:
+            assistantids.remove(client.id)
+        if number <= len(NAMES):
+            setattr(self, NAMES[number - 1], None)
+        if not client.is_connected:
+            return
+        try:
+            await client.stop()
+        except Exception:
             try:
-                await self.five.send_message(config.LOG_GROUP_ID, "Assistant Started")
-            except:
-                LOGGER(__name__).error(
-                    "Assistant Account 5 has failed to access the log Group. Make sure that you have added your assistant to your log group and promoted as admin! "
-                )
-                exit()
-            self.five.id = self.five.me.id
-            self.five.name = self.five.me.mention
-            self.five.username = self.five.me.username
-            assistantids.append(self.five.id)
-            LOGGER(__name__).info(f"Assistant Five Started as {self.five.name}")
+                await client.disconnect()
+            except Exception as e:
+                LOGGER(__name__).warning(f"Could not disconnect assistant {number}: {e}")
 
     async def stop(self):
         LOGGER(__name__).info(f"Stopping Assistants...")
-        try:
-            if config.STRING1:
-                await self.one.stop()
-            if config.STRING2:
-                await self.two.stop()
-            if config.STRING3:
-                await self.three.stop()
-            if config.STRING4:
-                await self.four.stop()
-            if config.STRING5:
-                await self.five.stop()
-        except:
-            pass
-
+        await fan_out(
+            self.clients, lambda client: client.stop(), config.FANOUT_TIMEOUT
+        )
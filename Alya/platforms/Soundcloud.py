@@ -1,14 +1,15 @@
-from os import path
-
-from yt_dlp import YoutubeDL
+import os
 
 from Alya.utils.formatters import seconds_to_min
+from Alya.utils.mediacache import register, shard_path
+from Alya.utils.scheduler import NOW_PLAYING, download_slot
+from Alya.utils.ytdlp_pool import extract_info
 
 
 class SoundAPI:
     def __init__(self):
         self.opts = {
-            "outtmpl": "downloads/%(id)s.%(ext)s",
+            "outtmpl": "downloads/tmp/%(id)s.%(ext)s",
             "format": "best",
             "retries": 3,
             "nooverwrites": False,
@@ -21,13 +22,20 @@ class SoundAPI:
         else:
             return False
 
-    async def download(self, url):
-        d = YoutubeDL(self.opts)
+    async def download(self, url, priority: int = NOW_PLAYING, chat_id: int = None):
         try:
-            info = d.extract_info(url)
+            async with download_slot(priority, chat_id):
+                info = await extract_info(url, self.opts, download=True)
         except:
             return False
-        xyz = path.join("downloads", f"{info['id']}.{info['ext']}")
+        xyz = shard_path("downloads", f"{info['id']}.{info['ext']}")
+        try:
+            os.replace(
+                os.path.join("downloads", "tmp", f"{info['id']}.{info['ext']}"), xyz
+            )
+        except OSError:
+            return False
+        register(xyz)
         duration_min = seconds_to_min(info["duration"])
         track_details = {
             "title": info["title"],
@@ -7,12 +7,48 @@ from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Voice
 
 import config
 from Alya import app
+from Alya.logging import LOGGER
 from Alya.utils.formatters import (
     check_duration,
     convert_bytes,
     get_readable_time,
     seconds_to_min,
 )
+from Alya.utils.mediacache import register, shard_path
+from Alya.utils.scheduler import NOW_PLAYING, download_slot, escalate, new_ticket
+
+# Containers ffmpeg can play from the front while the rest is still arriving
+STREAMABLE = {"mp3", "ogg", "oga", "opus", "flac", "wav", "aac", "webm", "mkv"}
+MP4_FAMILY = {"mp4", "m4a", "m4v", "mov"}
+# Files being written by a progressive download: path -> {"task", "prefix", "duration"}
+growing = {}
+
+
+def incomplete_marker(path: str) -> str:
+    return f"{path}.incomplete"
+
+
+def growing_params(path) -> str:
+    """ffmpeg input options for a file that is still being downloaded:
+    keep reading at EOF, and stop at the known duration instead of
+    waiting out the read timeout."""
+    if not os.path.exists(incomplete_marker(str(path))):
+        return ""
+    params = "-follow 1 -rw_timeout 15000000"
+    duration = (growing.get(str(path)) or {}).get("duration")
+    if duration:
+        params += f" -t {duration}"
+    return params
+
+
+def _streamable(path: str, prefix: bytes) -> bool:
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext in STREAMABLE:
+        return True
+    if ext in MP4_FAMILY:
+        moov, mdat = prefix.find(b"moov"), prefix.find(b"mdat")
+        return moov != -1 and (mdat == -1 or moov < mdat)
+    return False
 
 
 class TeleAPI:
@@ -80,7 +116,7 @@ class TeleAPI:
                 )
             except:
                 file_name = audio.file_unique_id + "." + "ogg"
-            file_name = os.path.join(os.path.realpath("downloads"), file_name)
+            file_name = shard_path(os.path.realpath("downloads"), file_name)
         if video:
             try:
                 file_name = (
@@ -88,16 +124,117 @@ class TeleAPI:
                 )
             except:
                 file_name = video.file_unique_id + "." + "mp4"
-            file_name = os.path.join(os.path.realpath("downloads"), file_name)
+            file_name = shard_path(os.path.realpath("downloads"), file_name)
         return file_name
 
-    async def download(self, _, message, mystic, fname):
+    async def _stream_to_file(self, media_message, fname, state):
+        marker = incomplete_marker(fname)
+        open(marker, "w").close()
+        written = 0
+        try:
+            # The slot is held until the last chunk, not just the prefix
+            async with download_slot(ticket=state["ticket"]):
+                with open(fname, "wb") as f:
+                    async for chunk in app.stream_media(media_message):
+                        f.write(chunk)
+                        f.flush()
+                        written += len(chunk)
+                        if written >= state["need"] and not state["prefix"].done():
+                            state["prefix"].set_result(True)
+            os.remove(marker)
+            register(fname)
+            LOGGER(__name__).info(f"Progressive download of {fname} finished ({written} bytes)")
+        except BaseException:
+            if not state["prefix"].done():
+                state["prefix"].set_result(False)
+            for path in (fname, marker):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        finally:
+            if not state["prefix"].done():
+                state["prefix"].set_result(written > 0)
+            growing.pop(fname, None)
+
+    async def progressive_download(
+        self, message, mystic, fname, priority: int = NOW_PLAYING, chat_id: int = None
+    ):
+        """Stream the replied media into fname and return once a safe prefix
+        is on disk, leaving the rest to download while the call plays it.
+        Concurrent plays of the same file_unique_id share one download."""
+        state = growing.get(fname)
+        if state is None:
+            media = message.reply_to_message
+            file = media.audio or media.voice or media.video or media.document
+            size = getattr(file, "file_size", 0) or 0
+            state = {
+                "prefix": asyncio.get_running_loop().create_future(),
+                "need": min(config.TG_SAFE_PREFIX * 1024 * 1024, size) or 1,
+                "duration": getattr(file, "duration", None),
+                "ticket": new_ticket(priority, chat_id),
+            }
+            growing[fname] = state
+            state["task"] = asyncio.create_task(self._stream_to_file(media, fname, state))
+        else:
+            escalate(state["ticket"], priority)
+        config.lyrical[mystic.id] = state["task"]
+        try:
+            ok = await asyncio.shield(state["prefix"])
+        finally:
+            config.lyrical.pop(mystic.id, None)
+        if not ok:
+            return False
+        with open(fname, "rb") as f:
+            prefix = f.read(state["need"])
+        if not _streamable(fname, prefix):
+            # Index at the tail (e.g. mp4 with moov last): wait for all of it
+            return await self._wait_complete(state["task"])
+        return True
+
+    async def _wait_complete(self, task) -> bool:
+        await asyncio.wait({task})
+        return not task.cancelled() and task.exception() is None
+
+    async def download(
+        self, _, message, mystic, fname, priority: int = NOW_PLAYING, chat_id: int = None
+    ):
+        chat_id = chat_id or message.chat.id
         lower = [0, 8, 17, 38, 64, 77, 96]
         higher = [5, 10, 20, 40, 66, 80, 99]
         checker = [5, 10, 20, 40, 66, 80, 99]
         speed_counter = {}
+        if os.path.exists(incomplete_marker(fname)):
+            if fname not in growing:
+                # Left behind by a restart mid-download
+                for path in (fname, incomplete_marker(fname)):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+            elif config.TG_PROGRESSIVE:
+                return await self.progressive_download(
+                    message, mystic, fname, priority, chat_id
+                )
+            else:
+                escalate(growing[fname]["ticket"], priority)
+                return await self._wait_complete(growing[fname]["task"])
         if os.path.exists(fname):
             return True
+        if config.TG_PROGRESSIVE and fname.rsplit(".", 1)[-1].lower() in STREAMABLE | MP4_FAMILY:
+            started = time.time()
+            try:
+                ok = await self.progressive_download(
+                    message, mystic, fname, priority, chat_id
+                )
+                if ok:
+                    elapsed = get_readable_time(int(time.time() - started))
+                    await mystic.edit_text(_["tg_2"].format(elapsed or "0 sᴇᴄᴏɴᴅs"))
+                    return True
+            except Exception as e:
+                LOGGER(__name__).warning(f"Progressive download of {fname} failed: {e}")
+            return False
 
         async def down_load():
             async def progress(current, total):
@@ -166,9 +303,10 @@ class TeleAPI:
             except:
                 await mystic.edit_text(_["tg_3"])
 
-        task = asyncio.create_task(down_load())
-        config.lyrical[mystic.id] = task
-        await task
+        async with download_slot(priority, chat_id):
+            task = asyncio.create_task(down_load())
+            config.lyrical[mystic.id] = task
+            await task
         verify = config.lyrical.get(mystic.id)
         if not verify:
             return False
@@ -1,34 +1,65 @@
 import asyncio
+import glob
 import os
 import re
 import json
 import time
+from collections import OrderedDict
 from typing import Union
 import requests
-import yt_dlp
 from pyrogram.enums import MessageEntityType
 from pyrogram.types import Message
 from youtubesearchpython.__future__ import VideosSearch
+from Alya.utils.breaker import CircuitBreaker
 from Alya.utils.database import is_on_off
 from Alya import app  # Import userbot here
 from Alya.utils.formatters import time_to_seconds
 import random
 import logging
 import aiohttp
+from Alya.utils.http_client import get_session
+from Alya.utils.mediacache import register, shard_dir, touch
+from Alya.utils.ranged import ranged_download
+from Alya.utils.scheduler import (
+    NOW_PLAYING,
+    download_context,
+    download_slot,
+    escalate,
+    new_ticket,
+)
+from Alya.utils.ytdlp_pool import extract_info
 from Alya import LOGGER
 from urllib.parse import urlparse
 from pyrogram import Client
 from pyrogram.errors import RPCError
-from config import API_KEY
+from config import API_KEY, DIRECT_STREAM
 # Your local API server URL
 YOUR_API_URL = "http://138.2.101.220:8080"
 
-# File cleanup configuration
-CLEANUP_INTERVAL = 6 * 3600  # 6 hours in seconds
 DOWNLOAD_DIR = "downloads"
 
-# Initialize cleanup task
-_cleanup_task = None
+# Media API health
+API_STATUS_TTL = 300
+api_breaker = CircuitBreaker("media-api", threshold=3, reset_timeout=60)
+api_status = {"remaining": None, "checked": 0, "task": None}
+
+# Shared VideosSearch cache
+SEARCH_CACHE_TTL = 3600
+SEARCH_CACHE_SIZE = 1024
+_search_cache = OrderedDict()
+_search_inflight = {}
+
+# Downloads keyed by (video id, kind, quality)
+DOWNLOAD_QUALITY = {"audio": "best", "video": "720"}
+DOWNLOAD_TMP_DIR = os.path.join(DOWNLOAD_DIR, "tmp")
+_download_index = {}
+_download_inflight = {}
+
+# Direct media URLs for DIRECT_STREAM, kept until shortly before they expire
+STREAM_URL_TTL = 3 * 3600
+STREAM_URL_MARGIN = 300
+STREAM_URL_CACHE_SIZE = 1024
+_stream_urls = {}
 
 def cookie_txt_file():
     cookie_dir = "AloneMusic/cookies"
@@ -40,83 +71,86 @@ def cookie_txt_file():
     cookie_file = os.path.join(cookie_dir, random.choice(cookies_files))
     return cookie_file
 
-async def start_cleanup_task():
-    """Start the background cleanup task"""
-    global _cleanup_task
-    if _cleanup_task is None:
-        _cleanup_task = asyncio.create_task(cleanup_old_files())
-        LOGGER("AloneMusic/platforms/Youtube.py").info("🔄 File cleanup task started")
-
-async def stop_cleanup_task():
-    """Stop the background cleanup task"""
-    global _cleanup_task
-    if _cleanup_task:
-        _cleanup_task.cancel()
-        try:
-            await _cleanup_task
-        except asyncio.CancelledError:
-            pass
-        _cleanup_task = None
-        LOGGER("AloneMusic/platforms/Youtube.py").info("🛑 File cleanup task stopped")
+def download_key(video_id: str, kind: str) -> tuple:
+    return (video_id, kind, DOWNLOAD_QUALITY[kind])
 
-async def cleanup_old_files():
-    """Background task to clean up files older than 6 hours"""
-    logger = LOGGER("AloneMusic/platforms/Youtube.py")
-    
-    while True:
-        try:
-            await asyncio.sleep(3600)  # Check every hour
-            
-            if not os.path.exists(DOWNLOAD_DIR):
-                continue
-                
-            current_time = time.time()
-            deleted_count = 0
-            
-            for filename in os.listdir(DOWNLOAD_DIR):
-                file_path = os.path.join(DOWNLOAD_DIR, filename)
-                
-                if os.path.isfile(file_path):
-                    file_age = current_time - os.path.getctime(file_path)
-                    
-                    if file_age > CLEANUP_INTERVAL:
-                        try:
-                            os.remove(file_path)
-                            deleted_count += 1
-                            logger.info(f"🧹 Cleaned up old file: {filename}")
-                        except Exception as e:
-                            logger.error(f"❌ Error cleaning up {filename}: {e}")
-            
-            if deleted_count > 0:
-                logger.info(f"🗑️ Cleanup completed: {deleted_count} files removed")
-                
-        except asyncio.CancelledError:
-            break
-        except Exception as e:
-            logger.error(f"💥 Cleanup task error: {e}")
-            await asyncio.sleep(300)  # Wait 5 minutes before retrying on error
+def download_stem(key: tuple) -> str:
+    return "-".join(key)
 
-def get_file_creation_time(file_path):
-    """Get file creation time, fallback to modification time if not available"""
-    try:
-        return os.path.getctime(file_path)
-    except:
-        return os.path.getmtime(file_path)
-
-async def check_and_cleanup_file(file_path):
-    """Check if a file should be cleaned up and remove it if too old"""
-    if not os.path.exists(file_path):
-        return
-    
-    current_time = time.time()
-    file_age = current_time - get_file_creation_time(file_path)
-    
-    if file_age > CLEANUP_INTERVAL:
+def cached_download(key: tuple):
+    """Path of a complete download for key, or None. Files only reach their
+    final name through an atomic rename, so anything found there is whole."""
+    entry = _download_index.get(key)
+    if entry:
+        path, size = entry
         try:
-            os.remove(file_path)
-            LOGGER("AloneMusic/platforms/Youtube.py").info(f"🧹 Auto-cleaned expired file: {os.path.basename(file_path)}")
-        except Exception as e:
-            LOGGER("AloneMusic/platforms/Youtube.py").error(f"❌ Error auto-cleaning file: {e}")
+            if os.path.getsize(path) == size:
+                touch(path)
+                return path
+        except OSError:
+            pass
+        _download_index.pop(key, None)
+    stem = download_stem(key)
+    for path in glob.glob(os.path.join(shard_dir(DOWNLOAD_DIR, stem), glob.escape(stem) + ".*")):
+        if path.endswith((".part", ".state")):
+            continue
+        size = os.path.getsize(path)
+        if size > 0:
+            _download_index[key] = (path, size)
+            touch(path)
+            return path
+    return None
+
+async def _fetch_download(key: tuple, fetch, ticket: dict):
+    async with download_slot(ticket=ticket):
+        file_path = await fetch()
+    if file_path and os.path.isfile(file_path):
+        _download_index[key] = (file_path, os.path.getsize(file_path))
+        register(file_path)
+    return file_path
+
+async def coalesced_download(key: tuple, fetch):
+    """Reuse the cached file for key or join the transfer already running
+    for it, so each (video, kind, quality) is downloaded once.
+
+    A caller more urgent than the transfer escalates it, and the transfer
+    is cancelled once nobody is waiting for it any more."""
+    file_path = cached_download(key)
+    if file_path:
+        LOGGER("AloneMusic/platforms/Youtube.py").info(f"♻️ Reusing cached download: {file_path}")
+        return file_path
+    inflight = _download_inflight.get(key)
+    if inflight is None:
+        ticket = new_ticket()
+        task = asyncio.ensure_future(_fetch_download(key, fetch, ticket))
+        inflight = {"task": task, "ticket": ticket, "waiters": 0}
+        _download_inflight[key] = inflight
+
+        def _done(_):
+            if _download_inflight.get(key) is inflight:
+                del _download_inflight[key]
+
+        task.add_done_callback(_done)
+    else:
+        escalate(inflight["ticket"])
+    inflight["waiters"] += 1
+    try:
+        return await asyncio.shield(inflight["task"])
+    finally:
+        inflight["waiters"] -= 1
+        if inflight["waiters"] == 0 and not inflight["task"].done():
+            inflight["task"].cancel()
+
+def promote_download(video_id: str, video: bool, priority: int = None):
+    """Escalate the in-flight download of video_id, e.g. when the track a
+    prefetch is fetching becomes the one playing."""
+    inflight = _download_inflight.get(download_key(video_id, "video" if video else "audio"))
+    if inflight:
+        escalate(inflight["ticket"], priority)
+
+def move_into_place(temp_path: str, file_path: str) -> str:
+    os.replace(temp_path, file_path)
+    return file_path
 
 async def download_direct_from_api(video_id: str, stream_type: str) -> str:
     """Download file directly from API using the stream endpoints"""
@@ -126,21 +160,15 @@ async def download_direct_from_api(video_id: str, stream_type: str) -> str:
     if stream_type == "audio":
         endpoint = f"{YOUR_API_URL}/stream/{video_id}"
         file_ext = "webm"
-        filename = f"{video_id}.webm"
     else:
         endpoint = f"{YOUR_API_URL}/video_stream/{video_id}"
         file_ext = "mp4"
-        filename = f"{video_id}.mp4"
     
-    file_path = os.path.join(DOWNLOAD_DIR, filename)
-    
-    # Clean up existing file if it exists
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            logger.info(f"🗑️ Removed existing file: {filename}")
-        except Exception as e:
-            logger.error(f"❌ Error removing existing file: {e}")
+    stem = download_stem(download_key(video_id, stream_type))
+    filename = f"{stem}.{file_ext}"
+    file_path = os.path.join(shard_dir(DOWNLOAD_DIR, stem), filename)
+    # Write to a temp name so readers never see a partial file
+    temp_path = f"{file_path}.part"
     
     # Download directly from API with Bearer token authentication
     try:
@@ -155,74 +183,39 @@ async def download_direct_from_api(video_id: str, stream_type: str) -> str:
         if stream_type == "audio":
             params["direct"] = 1
         
-        async with aiohttp.ClientSession(headers=headers) as session:
-            logger.info(f"📥 Downloading from: {endpoint}")
-            logger.info(f"🔑 Using API Key: {API_KEY[:10]}...")
-            logger.info(f"📝 Parameters: {params}")
+        logger.info(f"📥 Downloading from: {endpoint}")
+        logger.info(f"🔑 Using API Key: {API_KEY[:10]}...")
+        logger.info(f"📝 Parameters: {params}")
+        
+        stats = await ranged_download(endpoint, temp_path, headers=headers, params=params)
+        
+        # Verify the download
+        file_size = stats["size"]
+        if file_size > 0:
+            move_into_place(temp_path, file_path)
+            file_size_mb = file_size / (1024 * 1024)
+            logger.info(f"✅ Successfully downloaded: {filename} ({file_size_mb:.2f} MB)")
             
-            async with session.get(
-                endpoint,
-                params=params,
-                timeout=aiohttp.ClientTimeout(total=600)
-            ) as response:
-                
-                logger.info(f"📡 Response status: {response.status}")
-                logger.info(f"📡 Response headers: {dict(response.headers)}")
-                
-                if response.status == 401:
-                    logger.error("❌ Authentication failed: Invalid API Key")
-                    return None
-                elif response.status == 403:
-                    logger.error("❌ Forbidden: API Key expired or no requests remaining")
-                    return None
-                elif response.status != 200:
-                    # Try to read error message
-                    try:
-                        error_data = await response.json()
-                        logger.error(f"❌ API error: {error_data}")
-                    except:
-                        logger.error(f"❌ Download failed with status: {response.status}")
-                    return None
-                
-                # Get content length if available
-                content_length = response.headers.get('Content-Length')
-                if content_length:
-                    logger.info(f"📊 Expected file size: {int(content_length) / (1024*1024):.2f} MB")
-                
-                total_size = 0
-                with open(file_path, "wb") as f:
-                    async for chunk in response.content.iter_chunked(8192):
-                        if chunk:
-                            f.write(chunk)
-                            total_size += len(chunk)
+            # Check content type to ensure we got the right file
+            content_type = stats.get('content_type', '')
+            if stream_type == "audio" and 'audio' not in content_type.lower():
+                logger.warning(f"⚠️ Unexpected content type for audio: {content_type}")
+            elif stream_type == "video" and 'video' not in content_type.lower():
+                logger.warning(f"⚠️ Unexpected content type for video: {content_type}")
+            
+            return file_path
+        else:
+            logger.error(f"❌ Downloaded file is empty: {filename}")
+            return None
                 
-                # Verify the download
-                if os.path.exists(file_path):
-                    file_size = os.path.getsize(file_path)
-                    if file_size > 0:
-                        file_size_mb = file_size / (1024 * 1024)
-                        logger.info(f"✅ Successfully downloaded: {filename} ({file_size_mb:.2f} MB)")
-                        
-                        # Check content type to ensure we got the right file
-                        content_type = response.headers.get('Content-Type', '')
-                        if stream_type == "audio" and 'audio' not in content_type.lower():
-                            logger.warning(f"⚠️ Unexpected content type for audio: {content_type}")
-                        elif stream_type == "video" and 'video' not in content_type.lower():
-                            logger.warning(f"⚠️ Unexpected content type for video: {content_type}")
-                        
-                        return file_path
-                    else:
-                        logger.error(f"❌ Downloaded file is empty: {filename}")
-                        # Try to delete the empty file
-                        try:
-                            os.remove(file_path)
-                        except:
-                            pass
-                        return None
-                else:
-                    logger.error(f"❌ File was not created: {filename}")
-                    return None
-                    
+    except aiohttp.ClientResponseError as e:
+        if e.status == 401:
+            logger.error("❌ Authentication failed: Invalid API Key")
+        elif e.status == 403:
+            logger.error("❌ Forbidden: API Key expired or no requests remaining")
+        else:
+            logger.error(f"❌ Download failed with status {e.status}: {e.message}")
+        return None
     except asyncio.TimeoutError:
         logger.error(f"⏰ Timeout downloading {video_id}")
         return None
@@ -232,6 +225,13 @@ async def download_direct_from_api(video_id: str, stream_type: str) -> str:
     except Exception as e:
         logger.error(f"💥 Error downloading {video_id}: {e}")
         return None
+    finally:
+        # Keep partials that have resume state for the next attempt
+        if os.path.exists(temp_path) and not os.path.exists(f"{temp_path}.state"):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
 
 async def get_usage_info():
     """Get API key usage information"""
@@ -243,55 +243,80 @@ async def get_usage_info():
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
         }
         
-        async with aiohttp.ClientSession(headers=headers) as session:
-            status_url = f"{YOUR_API_URL}/api/status"
+        session = get_session()
+        status_url = f"{YOUR_API_URL}/api/status"
+        
+        async with session.get(
+            status_url,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
             
-            async with session.get(
-                status_url,
-                timeout=aiohttp.ClientTimeout(total=10)
-            ) as response:
+            if response.status == 200:
+                data = await response.json()
+                logger.info(f"📊 API Status: {data}")
+                return data
+            else:
+                logger.error(f"❌ Failed to get API status: {response.status}")
+                return None
                 
-                if response.status == 200:
-                    data = await response.json()
-                    logger.info(f"📊 API Status: {data}")
-                    return data
-                else:
-                    logger.error(f"❌ Failed to get API status: {response.status}")
-                    return None
-                    
     except Exception as e:
         logger.error(f"💥 Error getting API status: {e}")
         return None
 
+async def refresh_api_status():
+    """Refresh the cached API key status, feeding the circuit breaker"""
+    usage_info = await get_usage_info()
+    api_status["checked"] = time.time()
+    if not usage_info:
+        api_breaker.failure()
+        return None
+    api_breaker.success()
+    api_status["remaining"] = usage_info.get('requests_remaining', 0)
+    return usage_info
+
+def _refresh_task():
+    """The running status probe, started if there is none, so concurrent
+    callers share one request instead of each sending their own"""
+    task = api_status["task"]
+    if task is None or task.done():
+        task = asyncio.create_task(refresh_api_status())
+        api_status["task"] = task
+    return task
+
 async def check_api_key_status():
-    """Check if API key is valid and has remaining requests"""
+    """Check if the API should be used, without a round trip on the healthy path"""
     logger = LOGGER("AloneMusic/platforms/Youtube.py")
     
-    usage_info = await get_usage_info()
-    
-    if not usage_info:
-        logger.error("❌ Failed to check API key status")
+    if not api_breaker.allow():
+        logger.info("⛔ API circuit is open, using fallback")
         return False
     
-    remaining = usage_info.get('requests_remaining', 0)
-    if remaining <= 0:
+    if api_status["remaining"] is None:
+        # Failed probes open the breaker, which then grants one retry
+        # per reset_timeout
+        if not await asyncio.shield(_refresh_task()):
+            logger.error("❌ Failed to check API key status")
+            return False
+    elif time.time() - api_status["checked"] > API_STATUS_TTL:
+        _refresh_task()
+    
+    if api_status["remaining"] <= 0:
         logger.error("❌ API key has no remaining requests")
         return False
     
-    logger.info(f"✅ API Key Status: {remaining} requests remaining")
     return True
 
+def record_api_result(ok: bool):
+    """Feed a download outcome into the circuit breaker and quota counter"""
+    if ok:
+        api_breaker.success()
+        if api_status["remaining"] is not None:
+            api_status["remaining"] -= 1
+    else:
+        api_breaker.failure()
+
 async def download_song(link: str) -> str:
-    logger = LOGGER("AloneMusic/platforms/Youtube.py")
-    
-    # Start cleanup task if not already running
-    await start_cleanup_task()
-    
-    # Check API key status first
-    if not await check_api_key_status():
-        logger.error("❌ API Key check failed. Using fallback method directly.")
-        return await fallback_download_song(link)
-    
     # Extract video ID
     if 'v=' in link:
         video_id = link.split('v=')[-1].split('&')[0]
@@ -300,6 +325,18 @@ async def download_song(link: str) -> str:
     else:
         video_id = link
     
+    return await coalesced_download(
+        download_key(video_id, "audio"), lambda: _download_song(link, video_id)
+    )
+
+async def _download_song(link: str, video_id: str) -> str:
+    logger = LOGGER("AloneMusic/platforms/Youtube.py")
+    
+    # Check API key status first
+    if not await check_api_key_status():
+        logger.error("❌ API Key check failed. Using fallback method directly.")
+        return await fallback_download_song(link)
+    
     logger.info(f"🎵 [AUDIO] Starting download for: {video_id}")
 
     if not video_id or len(video_id) < 3:
@@ -318,6 +355,7 @@ async def download_song(link: str) -> str:
     # Try to download from API
     logger.info(f"🔗 [API] Using direct download method for audio")
     file_path = await download_direct_from_api(video_id, "audio")
+    record_api_result(bool(file_path))
     
     if file_path:
         return file_path
@@ -346,9 +384,11 @@ async def fallback_download_song(link: str) -> str:
             logger.info(f"🍪 Using cookie file: {cookie_file}")
             
             # Use yt-dlp as fallback
+            stem = download_stem(download_key(video_id, "audio"))
+            os.makedirs(DOWNLOAD_TMP_DIR, exist_ok=True)
             ydl_opts = {
                 'format': 'bestaudio/best',
-                'outtmpl': os.path.join(DOWNLOAD_DIR, f'{video_id}.%(ext)s'),
+                'outtmpl': os.path.join(DOWNLOAD_TMP_DIR, f'{stem}.%(ext)s'),
                 'quiet': True,
                 'no_warnings': True,
                 'cookiefile': cookie_file,
@@ -359,17 +399,19 @@ async def fallback_download_song(link: str) -> str:
                 }],
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(link, download=True)
-                filename = ydl.prepare_filename(info)
-                mp3_file = os.path.splitext(filename)[0] + '.mp3'
-                
-                if os.path.exists(mp3_file):
-                    logger.info(f"✅ [FALLBACK] Successfully downloaded: {mp3_file}")
-                    return mp3_file
-                else:
-                    logger.error(f"❌ [FALLBACK] File not created: {mp3_file}")
-                    return None
+            info = await extract_info(link, ydl_opts, download=True)
+            filename = info["_filename"]
+            mp3_file = os.path.splitext(filename)[0] + '.mp3'
+            
+            if os.path.exists(mp3_file):
+                mp3_file = move_into_place(
+                    mp3_file, os.path.join(shard_dir(DOWNLOAD_DIR, stem), os.path.basename(mp3_file))
+                )
+                logger.info(f"✅ [FALLBACK] Successfully downloaded: {mp3_file}")
+                return mp3_file
+            else:
+                logger.error(f"❌ [FALLBACK] File not created: {mp3_file}")
+                return None
         else:
             logger.error("❌ [FALLBACK] No cookie file available")
             return None
@@ -378,16 +420,6 @@ async def fallback_download_song(link: str) -> str:
         return None
 
 async def download_video(link: str) -> str:
-    logger = LOGGER("AloneMusic/platforms/Youtube.py")
-    
-    # Start cleanup task if not already running
-    await start_cleanup_task()
-    
-    # Check API key status first
-    if not await check_api_key_status():
-        logger.error("❌ API Key check failed. Using fallback method directly.")
-        return await fallback_download_video(link)
-    
     # Extract video ID
     if 'v=' in link:
         video_id = link.split('v=')[-1].split('&')[0]
@@ -396,6 +428,18 @@ async def download_video(link: str) -> str:
     else:
         video_id = link
     
+    return await coalesced_download(
+        download_key(video_id, "video"), lambda: _download_video(link, video_id)
+    )
+
+async def _download_video(link: str, video_id: str) -> str:
+    logger = LOGGER("AloneMusic/platforms/Youtube.py")
+    
+    # Check API key status first
+    if not await check_api_key_status():
+        logger.error("❌ API Key check failed. Using fallback method directly.")
+        return await fallback_download_video(link)
+    
     logger.info(f"🎥 [VIDEO] Starting download for: {video_id}")
 
     if not video_id or len(video_id) < 3:
@@ -414,6 +458,7 @@ async def download_video(link: str) -> str:
     # Try to download from API
     logger.info(f"🔗 [API] Using direct download method for video")
     file_path = await download_direct_from_api(video_id, "video")
+    record_api_result(bool(file_path))
     
     if file_path:
         return file_path
@@ -442,25 +487,29 @@ async def fallback_download_video(link: str) -> str:
             logger.info(f"🍪 Using cookie file: {cookie_file}")
             
             # Use yt-dlp as fallback
+            stem = download_stem(download_key(video_id, "video"))
+            os.makedirs(DOWNLOAD_TMP_DIR, exist_ok=True)
             ydl_opts = {
                 'format': 'bestvideo[height<=720]+bestaudio/best[height<=720]',
-                'outtmpl': os.path.join(DOWNLOAD_DIR, f'{video_id}.%(ext)s'),
+                'outtmpl': os.path.join(DOWNLOAD_TMP_DIR, f'{stem}.%(ext)s'),
                 'quiet': True,
                 'no_warnings': True,
                 'cookiefile': cookie_file,
                 'merge_output_format': 'mp4',
             }
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(link, download=True)
-                filename = ydl.prepare_filename(info)
-                
-                if os.path.exists(filename):
-                    logger.info(f"✅ [FALLBACK] Successfully downloaded: {filename}")
-                    return filename
-                else:
-                    logger.error(f"❌ [FALLBACK] File not created: {filename}")
-                    return None
+            info = await extract_info(link, ydl_opts, download=True)
+            filename = info["_filename"]
+        
+            if os.path.exists(filename):
+                filename = move_into_place(
+                    filename, os.path.join(shard_dir(DOWNLOAD_DIR, stem), os.path.basename(filename))
+                )
+                logger.info(f"✅ [FALLBACK] Successfully downloaded: {filename}")
+                return filename
+            else:
+                logger.error(f"❌ [FALLBACK] File not created: {filename}")
+                return None
         else:
             logger.error("❌ [FALLBACK] No cookie file available")
             return None
@@ -468,6 +517,84 @@ async def fallback_download_video(link: str) -> str:
         logger.error(f"❌ [FALLBACK] Error: {e}")
         return None
 
+def video_id_of(link: str):
+    """Canonical YouTube video id of a link or bare id, None for queries."""
+    match = re.search(
+        r"(?:v=|youtu\.be/|shorts/|embed/|live/)([A-Za-z0-9_-]{11})", link
+    )
+    if match:
+        return match.group(1)
+    if re.fullmatch(r"[A-Za-z0-9_-]{11}", link):
+        return link
+    return None
+
+
+def _cache_search(key, results):
+    _search_cache[key] = (time.time() + SEARCH_CACHE_TTL, results)
+    _search_cache.move_to_end(key)
+    while len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+
+async def _search(key, link: str, limit: int):
+    results = (await VideosSearch(link, limit=limit).next())["result"]
+    _cache_search(key, results)
+    if limit == 1 and results and key[0] != results[0]["id"]:
+        _cache_search((results[0]["id"], 1), results)
+    return results
+
+
+async def search_video(link: str, limit: int = 1) -> list:
+    """VideosSearch results shared through a bounded TTL cache keyed by the
+    canonical video id; concurrent callers await one in-flight search."""
+    key = (video_id_of(link) or link, limit)
+    hit = _search_cache.get(key)
+    if hit and hit[0] > time.time():
+        _search_cache.move_to_end(key)
+        return hit[1]
+    task = _search_inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_search(key, link, limit))
+        _search_inflight[key] = task
+        task.add_done_callback(lambda _: _search_inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+
+def _url_expiry(url: str) -> float:
+    match = re.search(r"[?&/]expire[=/](\d+)", url)
+    return int(match.group(1)) if match else time.time() + STREAM_URL_TTL
+
+
+async def resolve_stream_url(link: str, video: bool = False):
+    """Direct media URL for link, resolved with yt-dlp and cached until
+    STREAM_URL_MARGIN seconds before its expire= timestamp."""
+    key = (video_id_of(link) or link, "video" if video else "audio")
+    hit = _stream_urls.get(key)
+    if hit and hit[0] - STREAM_URL_MARGIN > time.time():
+        return hit[1]
+    opts = {
+        "quiet": True,
+        "no_warnings": True,
+        # ffmpeg gets a single URL, so video needs a progressive format
+        "format": "best[height<=720]/best" if video else "bestaudio/best",
+    }
+    cookie_file = cookie_txt_file()
+    if cookie_file:
+        opts["cookiefile"] = cookie_file
+    info = await extract_info(link, opts, download=False)
+    url = info.get("url")
+    if not url:
+        return None
+    if len(_stream_urls) >= STREAM_URL_CACHE_SIZE:
+        now = time.time()
+        for stale in [k for k, v in _stream_urls.items() if v[0] - STREAM_URL_MARGIN <= now]:
+            _stream_urls.pop(stale)
+        if len(_stream_urls) >= STREAM_URL_CACHE_SIZE:
+            _stream_urls.pop(next(iter(_stream_urls)))
+    _stream_urls[key] = (_url_expiry(url), url)
+    return url
+
+
 async def check_file_size(link):
     async def get_format_info(link):
         cookie_file = cookie_txt_file()
@@ -557,8 +684,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(link):
             title = result["title"]
             duration_min = result["duration"]
             thumbnail = result["thumbnails"][0]["url"].split("?")[0]
@@ -571,8 +697,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(link):
             return result["title"]
 
     async def duration(self, link: str, videoid: Union[bool, str] = None):
@@ -580,8 +705,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(link):
             return result["duration"]
 
     async def thumbnail(self, link: str, videoid: Union[bool, str] = None):
@@ -589,8 +713,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(link):
             return result["thumbnails"][0]["url"].split("?")[0]
 
     async def video(self, link: str, videoid: Union[bool, str] = None):
@@ -629,8 +752,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        results = VideosSearch(link, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(link):
             title = result["title"]
             duration_min = result["duration"]
             vidid = result["id"]
@@ -654,25 +776,23 @@ class YouTubeAPI:
         if not cookie_file:
             return [], link
         ytdl_opts = {"quiet": True, "cookiefile": cookie_file}
-        ydl = yt_dlp.YoutubeDL(ytdl_opts)
-        with ydl:
-            formats_available = []
-            r = ydl.extract_info(link, download=False)
-            for format in r["formats"]:
-                try:
-                    if "dash" not in str(format["format"]).lower():
-                        formats_available.append(
-                            {
-                                "format": format["format"],
-                                "filesize": format.get("filesize"),
-                                "format_id": format["format_id"],
-                                "ext": format["ext"],
-                                "format_note": format["format_note"],
-                                "yturl": link,
-                            }
-                        )
-                except:
-                    continue
+        formats_available = []
+        r = await extract_info(link, ytdl_opts, download=False)
+        for format in r["formats"]:
+            try:
+                if "dash" not in str(format["format"]).lower():
+                    formats_available.append(
+                        {
+                            "format": format["format"],
+                            "filesize": format.get("filesize"),
+                            "format_id": format["format_id"],
+                            "ext": format["ext"],
+                            "format_note": format["format_note"],
+                            "yturl": link,
+                        }
+                    )
+            except:
+                continue
         return formats_available, link
 
     async def slider(self, link: str, query_type: int, videoid: Union[bool, str] = None):
@@ -680,8 +800,7 @@ class YouTubeAPI:
             link = self.base + link
         if "&" in link:
             link = link.split("&")[0]
-        a = VideosSearch(link, limit=10)
-        result = (await a.next()).get("result")
+        result = await search_video(link, limit=10)
         title = result[query_type]["title"]
         duration_min = result[query_type]["duration"]
         vidid = result[query_type]["id"]
@@ -698,10 +817,33 @@ class YouTubeAPI:
         songvideo: Union[bool, str] = None,
         format_id: Union[bool, str] = None,
         title: Union[bool, str] = None,
+        local: Union[bool, str] = None,
+        priority: int = None,
+        chat_id: int = None,
     ) -> str:
+        if priority is not None or chat_id is not None:
+            token = download_context.set(
+                new_ticket(NOW_PLAYING if priority is None else priority, chat_id)
+            )
+            try:
+                return await self.download(
+                    link, mystic, video, videoid, songaudio, songvideo, format_id, title, local
+                )
+            finally:
+                download_context.reset(token)
         if videoid:
             link = self.base + link
 
+        if DIRECT_STREAM and not (local or songvideo or songaudio):
+            try:
+                url = await resolve_stream_url(link, bool(video))
+                if url:
+                    return url, False
+            except Exception as e:
+                LOGGER("AloneMusic/platforms/Youtube.py").warning(
+                    f"Direct URL for {link} failed, downloading instead: {e}"
+                )
+
         try:
             if songvideo or songaudio:
                 downloaded_file = await download_song(link)
@@ -724,10 +866,3 @@ class YouTubeAPI:
         except Exception as e:
             print(f"Download failed: {e}")
             return None, False
-
-# Initialize cleanup when module is imported
-async def initialize_module():
-    """Initialize the module with cleanup task"""
-    await start_cleanup_task()
-
-# Start cleanup task when module loads
@@ -0,0 +1,41 @@
+import time
+
+
+class CircuitBreaker:
+    """Closed -> open after ``threshold`` consecutive failures, open ->
+    half-open after ``reset_timeout`` seconds, where a single probe request
+    decides whether to close again or re-open."""
+
+    def __init__(self, name: str, threshold: int = 3, reset_timeout: int = 60):
+        self.name = name
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0
+        self.probe_at = 0
+
+    def allow(self) -> bool:
+        now = time.time()
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+        if now - self.probe_at < self.reset_timeout:
+            return False
+        self.probe_at = now
+        return True
+
+    def success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.probe_at = 0
+
+    def failure(self):
+        self.failures += 1
+        self.probe_at = 0
+        if self.state == "half_open" or self.failures >= self.threshold:
+            self.state = "open"
+            self.opened_at = time.time()
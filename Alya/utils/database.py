@@ -1,8 +1,8 @@
-import random
 from typing import Dict, List, Union
 
 from Alya import userbot
 from Alya.core.mongo import mongodb
+from Alya.utils.placement import is_saturated, least_loaded
 
 authdb = mongodb.adminauth
 authuserdb = mongodb.authuser
@@ -13,11 +13,13 @@ blockeddb = mongodb.blockedusers
 chatsdb = mongodb.chats
 channeldb = mongodb.cplaymode
 countdb = mongodb.upcount
+fileiddb = mongodb.photofileids
 gbansdb = mongodb.gban
 langdb = mongodb.language
 onoffdb = mongodb.onoffper
 playmodedb = mongodb.playmode
 playtypedb = mongodb.playtypedb
+queuesnapdb = mongodb.queuesnapshots
 skipdb = mongodb.skipmode
 sudoersdb = mongodb.sudoers
 usersdb = mongodb.tgusersdb
@@ -29,6 +31,7 @@ assistantdict = {}
 autoend = {}
 count = {}
 channelconnect = {}
+fileids = {}
 langm = {}
 loop = {}
 maintenance = []
@@ -45,16 +48,7 @@ async def get_assistant_number(chat_id: int) -> str:
 
 
 async def get_client(assistant: int):
-    if int(assistant) == 1:
-        return userbot.one
-    elif int(assistant) == 2:
-        return userbot.two
-    elif int(assistant) == 3:
-        return userbot.three
-    elif int(assistant) == 4:
-        return userbot.four
-    elif int(assistant) == 5:
-        return userbot.five
+    return userbot.clients.get(int(assistant))
 
 
 async def set_assistant_new(chat_id, number):
@@ -66,10 +60,20 @@ async def set_assistant_new(chat_id, number):
     )
 
 
+def _keep_assistant(chat_id: int, assistant) -> bool:
+    from Alya.core.userbot import assistants
+
+    if assistant not in assistants:
+        return False
+    if chat_id in active or not is_saturated(assistant):
+        return True
+    return least_loaded(assistants) == assistant
+
+
 async def set_assistant(chat_id):
     from Alya.core.userbot import assistants
 
-    ran_assistant = random.choice(assistants)
+    ran_assistant = least_loaded(assistants)
     assistantdict[chat_id] = ran_assistant
     await assdb.update_one(
         {"chat_id": chat_id},
@@ -81,8 +85,6 @@ async def set_assistant(chat_id):
 
 
 async def get_assistant(chat_id: int) -> str:
-    from Alya.core.userbot import assistants
-
     assistant = assistantdict.get(chat_id)
     if not assistant:
         dbassistant = await assdb.find_one({"chat_id": chat_id})
@@ -91,7 +93,7 @@ async def get_assistant(chat_id: int) -> str:
             return userbot
         else:
             got_assis = dbassistant["assistant"]
-            if got_assis in assistants:
+            if _keep_assistant(chat_id, got_assis):
                 assistantdict[chat_id] = got_assis
                 userbot = await get_client(got_assis)
                 return userbot
@@ -99,7 +101,7 @@ async def get_assistant(chat_id: int) -> str:
                 userbot = await set_assistant(chat_id)
                 return userbot
     else:
-        if assistant in assistants:
+        if _keep_assistant(chat_id, assistant):
             userbot = await get_client(assistant)
             return userbot
         else:
@@ -110,7 +112,7 @@ async def get_assistant(chat_id: int) -> str:
 async def set_calls_assistant(chat_id):
     from Alya.core.userbot import assistants
 
-    ran_assistant = random.choice(assistants)
+    ran_assistant = least_loaded(assistants)
     assistantdict[chat_id] = ran_assistant
     await assdb.update_one(
         {"chat_id": chat_id},
@@ -121,8 +123,6 @@ async def set_calls_assistant(chat_id):
 
 
 async def group_assistant(self, chat_id: int) -> int:
-    from Alya.core.userbot import assistants
-
     assistant = assistantdict.get(chat_id)
     if not assistant:
         dbassistant = await assdb.find_one({"chat_id": chat_id})
@@ -130,26 +130,56 @@ async def group_assistant(self, chat_id: int) -> int:
             assis = await set_calls_assistant(chat_id)
         else:
             assis = dbassistant["assistant"]
-            if assis in assistants:
+            if _keep_assistant(chat_id, assis):
                 assistantdict[chat_id] = assis
                 assis = assis
             else:
                 assis = await set_calls_assistant(chat_id)
     else:
-        if assistant in assistants:
+        if _keep_assistant(chat_id, assistant):
             assis = assistant
         else:
             assis = await set_calls_assistant(chat_id)
-    if int(assis) == 1:
-        return self.one
-    elif int(assis) == 2:
-        return self.two
-    elif int(assis) == 3:
-        return self.three
-    elif int(assis) == 4:
-        return self.four
-    elif int(assis) == 5:
-        return self.five
+    return self.calls.get(int(assis))
+
+
+async def get_photo_file_id(key: str) -> str:
+    file_id = fileids.get(key)
+    if not file_id:
+        photo = await fileiddb.find_one({"key": key})
+        if not photo:
+            return None
+        fileids[key] = photo["file_id"]
+        return photo["file_id"]
+    return file_id
+
+
+async def save_photo_file_id(key: str, file_id: str):
+    fileids[key] = file_id
+    await fileiddb.update_one(
+        {"key": key}, {"$set": {"file_id": file_id}}, upsert=True
+    )
+
+
+async def delete_photo_file_id(key: str):
+    fileids.pop(key, None)
+    await fileiddb.delete_one({"key": key})
+
+
+async def get_queue_snapshots() -> list:
+    return await queuesnapdb.find({"chat_id": {"$ne": None}}).to_list(length=None)
+
+
+async def save_queue_snapshot(chat_id: int, snapshot: dict):
+    await queuesnapdb.replace_one({"chat_id": chat_id}, snapshot, upsert=True)
+
+
+async def update_queue_snapshot(chat_id: int, fields: dict):
+    await queuesnapdb.update_one({"chat_id": chat_id}, {"$set": fields})
+
+
+async def delete_queue_snapshot(chat_id: int):
+    await queuesnapdb.delete_one({"chat_id": chat_id})
 
 
 async def is_skipmode(chat_id: int) -> bool:
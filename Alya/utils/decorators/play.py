@@ -21,6 +21,7 @@ from Alya.utils.database import (
     is_maintenance,
 )
 from Alya.utils.inline import botplaylist_markup
+from Alya.utils.tracing import end_trace, platform_of, start_trace, tag_trace, trace_lap
 from config import PLAYLIST_IMG_URL, SUPPORT_CHAT, adminlist
 from strings import get_string
 
@@ -28,7 +29,7 @@ links = {}
 
 
 def PlayWrapper(command):
-    async def wrapper(client, message):
+    async def play(client, message):
         language = await get_lang(message.chat.id)
         _ = get_string(language)
         if message.sender_chat:
@@ -67,6 +68,11 @@ def PlayWrapper(command):
             else None
         )
         url = await YouTube.url(message)
+        tag_trace(
+            platform="telegram"
+            if audio_telegram or video_telegram
+            else platform_of(url)
+        )
         if audio_telegram is None and video_telegram is None and url is None:
             if len(message.command) < 2:
                 if "stream" in message.command:
@@ -180,6 +186,7 @@ def PlayWrapper(command):
                 except:
                     pass
 
+        trace_lap("wrapper")
         return await command(
             client,
             message,
@@ -192,4 +199,11 @@ def PlayWrapper(command):
             fplay,
         )
 
+    async def wrapper(client, message):
+        token = start_trace(message.chat.id)
+        try:
+            return await play(client, message)
+        finally:
+            end_trace(token)
+
     return wrapper
@@ -1,3 +1,8 @@
 class AssistantErr(Exception):
     def __init__(self, errr: str):
         super().__init__(errr)
+
+
+class ChatBusy(Exception):
+    def __init__(self, chat_id: int):
+        super().__init__(f"Too many pending stream transitions in {chat_id}")
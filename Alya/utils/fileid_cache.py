@@ -0,0 +1,26 @@
+from pyrogram.errors import BadRequest
+
+from Alya import app
+from Alya.logging import LOGGER
+from Alya.utils.database import (
+    delete_photo_file_id,
+    get_photo_file_id,
+    save_photo_file_id,
+)
+
+
+async def send_photo(chat_id, photo, **kwargs):
+    """app.send_photo that reuses the Telegram file_id of an earlier send of
+    the same local path or URL instead of uploading it again."""
+    key = str(photo)
+    file_id = await get_photo_file_id(key)
+    if file_id:
+        try:
+            return await app.send_photo(chat_id, photo=file_id, **kwargs)
+        except BadRequest as e:
+            LOGGER(__name__).info(f"Dropping cached file_id of {key}: {e}")
+            await delete_photo_file_id(key)
+    run = await app.send_photo(chat_id, photo=photo, **kwargs)
+    if run and run.photo:
+        await save_photo_file_id(key, run.photo.file_id)
+    return run
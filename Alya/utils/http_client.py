@@ -0,0 +1,32 @@
+import aiohttp
+
+from Alya.logging import LOGGER
+
+HTTP_POOL_LIMIT = 100
+HTTP_HOST_LIMIT = 16
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=60, connect=10)
+
+_session = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """The app-wide aiohttp session: keep-alive pools per host, cached DNS
+    and a per-host connection cap shared by every platform client."""
+    global _session
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_HOST_LIMIT,
+            ttl_dns_cache=300,
+            keepalive_timeout=60,
+        )
+        _session = aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT)
+    return _session
+
+
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        LOGGER(__name__).info("HTTP session closed")
+    _session = None
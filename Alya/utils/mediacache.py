@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import config
+from Alya.logging import LOGGER
+
+MEDIA_ROOTS = ["downloads", "cache", "playback"]
+INDEX_PATH = os.path.join("cache", "media_index.json")
+MAINTAIN_INTERVAL = 60
+
+index = {}
+_state = {"dirty": False, "task": None}
+
+
+def shard_dir(root: str, name: str) -> str:
+    """root/<2 hex of name>, so no directory grows past a few hundred entries."""
+    folder = os.path.join(root, hashlib.md5(name.encode()).hexdigest()[:2])
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+def shard_path(root: str, name: str) -> str:
+    return os.path.join(shard_dir(root, name), name)
+
+
+def _key(path) -> str:
+    return os.path.relpath(os.path.abspath(str(path)))
+
+
+def managed(path) -> bool:
+    if not path:
+        return False
+    key = _key(path)
+    return any(key.startswith(root + os.sep) for root in MEDIA_ROOTS)
+
+
+def register(path) -> str:
+    """Record a finished file, then evict if that pushed us over budget."""
+    if not managed(path) or not os.path.isfile(str(path)):
+        return path
+    key = _key(path)
+    entry = index.setdefault(key, {"size": 0, "atime": 0, "pins": 0})
+    entry["size"] = os.path.getsize(key)
+    entry["atime"] = time.time()
+    _state["dirty"] = True
+    evict()
+    return path
+
+
+def touch(path):
+    entry = index.get(_key(path)) if managed(path) else None
+    if entry:
+        entry["atime"] = time.time()
+        _state["dirty"] = True
+
+
+def pin(path):
+    if not managed(path):
+        return
+    key = _key(path)
+    if key not in index:
+        register(key)
+    entry = index.get(key)
+    if entry:
+        entry["pins"] += 1
+        entry["atime"] = time.time()
+        _state["dirty"] = True
+
+
+def unpin(path):
+    entry = index.get(_key(path)) if managed(path) else None
+    if entry and entry["pins"] > 0:
+        entry["pins"] -= 1
+        entry["atime"] = time.time()
+        _state["dirty"] = True
+
+
+def usage() -> int:
+    return sum(entry["size"] for entry in index.values())
+
+
+def evict():
+    budget = config.MEDIA_CACHE_LIMIT * 1024 * 1024
+    total = usage()
+    if total <= budget:
+        return
+    for key, entry in sorted(index.items(), key=lambda x: x[1]["atime"]):
+        if total <= budget:
+            break
+        if entry["pins"] > 0:
+            continue
+        try:
+            os.remove(key)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            LOGGER(__name__).warning(f"Could not evict {key}: {e}")
+            continue
+        total -= index.pop(key)["size"]
+        _state["dirty"] = True
+        LOGGER(__name__).info(f"Evicted {key} ({entry['size']} bytes)")
+
+
+def save_index():
+    if not _state["dirty"]:
+        return
+    temp = f"{INDEX_PATH}.part"
+    try:
+        with open(temp, "w") as f:
+            json.dump(index, f)
+        os.replace(temp, INDEX_PATH)
+        _state["dirty"] = False
+    except OSError as e:
+        LOGGER(__name__).warning(f"Could not save media index: {e}")
+
+
+def load_index():
+    """Load the saved index and reconcile it with what is on disk: entries
+    for vanished files are dropped, unknown files are adopted. Pins are not
+    persisted; restored queues take theirs again."""
+    try:
+        with open(INDEX_PATH) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        saved = {}
+    index.clear()
+    skip = {_key(INDEX_PATH), _key(f"{INDEX_PATH}.part")}
+    for root in MEDIA_ROOTS:
+        for folder, _, files in os.walk(root):
+            for name in files:
+                key = _key(os.path.join(folder, name))
+                if key in skip:
+                    continue
+                try:
+                    stat = os.stat(key)
+                except OSError:
+                    continue
+                atime = saved.get(key, {}).get("atime", stat.st_mtime)
+                index[key] = {"size": stat.st_size, "atime": atime, "pins": 0}
+    _state["dirty"] = True
+    LOGGER(__name__).info(
+        f"Media cache: {len(index)} files, {usage() / 1024 / 1024:.1f} MB"
+    )
+
+
+async def _maintain():
+    while True:
+        await asyncio.sleep(MAINTAIN_INTERVAL)
+        try:
+            evict()
+            save_index()
+        except Exception as e:
+            LOGGER(__name__).error(f"Media cache maintenance failed: {e}")
+
+
+def start_media_cache():
+    if _state["task"] is None:
+        load_index()
+        evict()
+        _state["task"] = asyncio.create_task(_maintain())
+
+
+async def stop_media_cache():
+    task = _state["task"]
+    if task:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        _state["task"] = None
+    save_index()
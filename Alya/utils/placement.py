@@ -0,0 +1,160 @@
+import time
+from collections import deque
+
+import psutil
+
+import config
+
+assistant_load = {}
+chat_assistant = {}
+
+FAILURE_WINDOW = 300
+CPU_SAMPLE_TTL = 10
+
+_cpu_sample = {"time": 0, "usage": {}}
+# pid -> psutil.Process; cpu_percent() measures since the previous call on
+# the same object, so the objects must outlive a single sample
+_ffmpeg_procs = {}
+
+
+def _load(assistant: int) -> dict:
+    assistant = int(assistant)
+    load = assistant_load.get(assistant)
+    if load is None:
+        load = {
+            "calls": set(),
+            "video": set(),
+            "failures": deque(maxlen=20),
+            "joins": 0,
+        }
+        assistant_load[assistant] = load
+    return load
+
+
+def call_started(assistant: int, chat_id: int, video: bool = False):
+    load = _load(assistant)
+    old = chat_assistant.get(chat_id)
+    if old is not None and old != int(assistant):
+        call_ended(chat_id)
+    chat_assistant[chat_id] = int(assistant)
+    load["calls"].add(chat_id)
+    load["joins"] += 1
+    if video:
+        load["video"].add(chat_id)
+    else:
+        load["video"].discard(chat_id)
+
+
+def call_ended(chat_id: int):
+    assistant = chat_assistant.pop(chat_id, None)
+    if assistant is None:
+        return
+    load = _load(assistant)
+    load["calls"].discard(chat_id)
+    load["video"].discard(chat_id)
+
+
+def join_failed(assistant: int):
+    _load(assistant)["failures"].append(time.time())
+
+
+def recent_failures(assistant: int) -> int:
+    cutoff = time.time() - FAILURE_WINDOW
+    return len([x for x in _load(assistant)["failures"] if x > cutoff])
+
+
+def _sample_ffmpeg_cpu() -> dict:
+    """Attribute ffmpeg CPU to assistants by matching each child's
+    command line against the file the assistant's chats are playing."""
+    now = time.time()
+    if now - _cpu_sample["time"] < CPU_SAMPLE_TTL:
+        return _cpu_sample["usage"]
+    from Alya.misc import db
+
+    playing = {}
+    for chat_id, assistant in chat_assistant.items():
+        queue = db.get(chat_id)
+        if not queue:
+            continue
+        path = queue[0].get("speed_path") or queue[0].get("file")
+        if path:
+            playing[str(path)] = assistant
+    usage = {}
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        children = []
+    alive = {}
+    for child in children:
+        proc = _ffmpeg_procs.get(child.pid)
+        if proc is None or not proc.is_running():
+            try:
+                if "ffmpeg" not in child.name():
+                    continue
+                # The first call only primes the counter and returns 0.0
+                child.cpu_percent(interval=None)
+            except psutil.Error:
+                continue
+            alive[child.pid] = child
+            continue
+        alive[child.pid] = proc
+        try:
+            cmdline = " ".join(proc.cmdline())
+            cpu = proc.cpu_percent(interval=None)
+        except psutil.Error:
+            alive.pop(child.pid, None)
+            continue
+        for path, assistant in playing.items():
+            if path in cmdline:
+                usage[assistant] = usage.get(assistant, 0.0) + cpu
+                break
+    _ffmpeg_procs.clear()
+    _ffmpeg_procs.update(alive)
+    _cpu_sample["time"] = now
+    _cpu_sample["usage"] = usage
+    return usage
+
+
+def load_score(assistant: int) -> float:
+    load = _load(assistant)
+    cpu = _sample_ffmpeg_cpu().get(int(assistant), 0.0)
+    return (
+        len(load["calls"])
+        + len(load["video"])
+        + cpu / 100
+        + 2 * recent_failures(assistant)
+    )
+
+
+def is_saturated(assistant: int) -> bool:
+    return len(_load(assistant)["calls"]) >= config.ASSISTANT_MAX_CALLS
+
+
+def is_healthy(assistant: int) -> bool:
+    return recent_failures(assistant) < config.ASSISTANT_MAX_FAILURES
+
+
+def least_loaded(assistants: list):
+    if not assistants:
+        return None
+    healthy = [x for x in assistants if is_healthy(x) and not is_saturated(x)]
+    candidates = healthy or [x for x in assistants if is_healthy(x)] or assistants
+    return min(candidates, key=lambda x: (load_score(x), x))
+
+
+def get_assistant_loads() -> dict:
+    from Alya.core.userbot import assistants
+
+    cpu = _sample_ffmpeg_cpu()
+    loads = {}
+    for assistant in assistants:
+        load = _load(assistant)
+        loads[assistant] = {
+            "calls": len(load["calls"]),
+            "video": len(load["video"]),
+            "cpu": round(cpu.get(assistant, 0.0), 1),
+            "failures": recent_failures(assistant),
+            "joins": load["joins"],
+            "saturated": is_saturated(assistant),
+        }
+    return loads
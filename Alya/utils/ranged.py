@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+import re
+import time
+from collections import deque
+
+import aiohttp
+
+import config
+from Alya.logging import LOGGER
+from Alya.utils.http_client import get_session
+from Alya.utils.scheduler import throttle
+
+READ_SIZE = 64 * 1024
+CHUNK_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=10, sock_read=30)
+
+download_stats = deque(maxlen=100)
+
+
+def _state_path(path: str) -> str:
+    return f"{path}.state"
+
+
+def _load_state(path: str, total: int) -> set:
+    """Chunks finished by an earlier attempt at the same partial file."""
+    try:
+        with open(_state_path(path)) as f:
+            state = json.load(f)
+        if state["total"] == total and os.path.getsize(path) == total:
+            return set(state["done"])
+    except (OSError, ValueError, KeyError):
+        pass
+    return set()
+
+
+def _save_state(path: str, total: int, done: set):
+    try:
+        with open(_state_path(path), "w") as f:
+            json.dump({"total": total, "done": sorted(done)}, f)
+    except OSError:
+        pass
+
+
+def _drop_state(path: str):
+    try:
+        os.remove(_state_path(path))
+    except OSError:
+        pass
+
+
+async def _raise_for_status(response):
+    if response.status not in (200, 206):
+        raise aiohttp.ClientResponseError(
+            response.request_info,
+            response.history,
+            status=response.status,
+            message=(await response.text())[:200],
+        )
+
+
+async def _write_body(fd: int, response, position: dict, progress: dict) -> int:
+    """Write the body at position["offset"], advancing it after every write
+    so a dropped connection leaves it at the last byte on disk."""
+    async for data in response.content.iter_chunked(READ_SIZE):
+        await throttle(len(data))
+        os.pwrite(fd, data, position["offset"])
+        position["offset"] += len(data)
+        if progress["first_byte"] is None:
+            progress["first_byte"] = time.perf_counter()
+    return position["offset"]
+
+
+async def _fetch_chunk(url, fd, start, end, headers, params, progress):
+    """Fetch bytes start..end into fd, resuming from the last written offset
+    when the connection drops."""
+    position = {"offset": start}
+    for attempt in range(config.DOWNLOAD_RETRIES + 1):
+        try:
+            async with get_session().get(
+                url,
+                params=params,
+                headers={**headers, "Range": f"bytes={position['offset']}-{end}"},
+                timeout=CHUNK_TIMEOUT,
+            ) as response:
+                await _raise_for_status(response)
+                if response.status != 206:
+                    raise aiohttp.ClientPayloadError("Range request was ignored")
+                await _write_body(fd, response, position, progress)
+            if position["offset"] > end:
+                return
+            raise aiohttp.ClientPayloadError(
+                f"Chunk ended at {position['offset']}, wanted {end + 1}"
+            )
+        except (aiohttp.ClientPayloadError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            if attempt == config.DOWNLOAD_RETRIES:
+                raise
+            LOGGER(__name__).warning(
+                f"Resuming chunk {start}-{end} at {position['offset']} after {type(e).__name__}"
+            )
+            await asyncio.sleep(min(2**attempt, 10))
+
+
+async def ranged_download(url: str, path: str, headers: dict = None, params: dict = None) -> dict:
+    """Download url into path with HTTP Range requests.
+
+    The first chunk doubles as the probe: a 206 reply carries the total size,
+    the file is preallocated and the remaining chunks are fetched over up to
+    DOWNLOAD_CONNECTIONS connections, each written in place with os.pwrite.
+    Servers that ignore Range get a plain sequential download. Chunks that
+    finished before a failure are kept and skipped on the next attempt."""
+    headers = headers or {}
+    chunk_size = config.DOWNLOAD_CHUNK_SIZE * 1024
+    started = time.perf_counter()
+    progress = {"first_byte": None}
+    stats = {"url": url, "path": path, "connections": 1, "resumed": 0}
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        async with get_session().get(
+            url,
+            params=params,
+            headers={**headers, "Range": f"bytes=0-{chunk_size - 1}"},
+            timeout=CHUNK_TIMEOUT,
+        ) as response:
+            await _raise_for_status(response)
+            stats["content_type"] = response.headers.get("Content-Type", "")
+            match = re.search(r"/(\d+)$", response.headers.get("Content-Range", ""))
+            if response.status != 206 or not match:
+                os.ftruncate(fd, 0)
+                total = await _write_body(fd, response, {"offset": 0}, progress)
+                length = response.headers.get("Content-Length")
+                if length and total != int(length):
+                    raise aiohttp.ClientPayloadError(
+                        f"Truncated download ({total}/{length} bytes)"
+                    )
+                stats["size"] = total
+                return _finish(stats, started, progress)
+            total = int(match.group(1))
+            done = _load_state(path, total)
+            stats["resumed"] = len(done)
+            if os.fstat(fd).st_size != total:
+                os.ftruncate(fd, total)
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(fd, 0, total)
+            if 0 not in done:
+                end = await _write_body(fd, response, {"offset": 0}, progress)
+                if end >= min(chunk_size, total):
+                    done.add(0)
+        stats["size"] = total
+        chunks = [
+            (index, index * chunk_size, min((index + 1) * chunk_size, total) - 1)
+            for index in range((total + chunk_size - 1) // chunk_size)
+            if index not in done
+        ]
+        if total >= config.DOWNLOAD_SPLIT_SIZE * 1024 * 1024:
+            stats["connections"] = max(1, min(config.DOWNLOAD_CONNECTIONS, len(chunks)))
+        pending = deque(chunks)
+
+        async def worker():
+            while pending:
+                index, start, end = pending.popleft()
+                await _fetch_chunk(url, fd, start, end, headers, params, progress)
+                done.add(index)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(stats["connections"])]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            _save_state(path, total, done)
+            raise
+        _drop_state(path)
+        return _finish(stats, started, progress)
+    finally:
+        os.close(fd)
+
+
+def _finish(stats: dict, started: float, progress: dict) -> dict:
+    elapsed = time.perf_counter() - started
+    first_byte = progress["first_byte"] or time.perf_counter()
+    stats["ttfb"] = round(first_byte - started, 3)
+    stats["elapsed"] = round(elapsed, 3)
+    stats["throughput"] = round(stats["size"] / 1024 / 1024 / max(elapsed, 0.001), 2)
+    download_stats.append(stats)
+    LOGGER(__name__).info(
+        f"Downloaded {os.path.basename(stats['path'])}: {stats['size']} bytes, "
+        f"ttfb {stats['ttfb']}s, {stats['throughput']} MB/s over "
+        f"{stats['connections']} connection(s), {stats['resumed']} chunk(s) resumed"
+    )
+    return stats
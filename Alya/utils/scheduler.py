@@ -0,0 +1,185 @@
+import asyncio
+import contextvars
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+import config
+
+NOW_PLAYING = 0
+NEXT_UP = 1
+PREFETCH = 2
+BULK = 3
+PRIORITY_NAMES = ["now_playing", "next_up", "prefetch", "bulk"]
+
+# Ticket of the download the current task is working for
+download_context = contextvars.ContextVar("download_context", default=None)
+
+waiting = [OrderedDict() for _ in PRIORITY_NAMES]
+_state = {"running": 0, "foreground": 0, "tokens": 0.0, "refilled": 0.0}
+_DEFAULT = {"priority": NOW_PLAYING, "chat_id": None}
+
+
+def _background(priority: int) -> bool:
+    return priority >= PREFETCH
+
+
+def current_ticket() -> dict:
+    return download_context.get() or _DEFAULT
+
+
+def new_ticket(priority: int = None, chat_id: int = None) -> dict:
+    """A mutable record of one download's priority, shared by everything
+    working for it so an escalation is seen by all of them. Priority and
+    chat default to the enclosing download_context."""
+    current = current_ticket()
+    return {
+        "priority": current["priority"] if priority is None else priority,
+        "chat_id": current["chat_id"] if chat_id is None else chat_id,
+        "state": "new",
+        "future": None,
+        "escalated": asyncio.Event(),
+    }
+
+
+def _can_start(priority: int) -> bool:
+    limit = config.DOWNLOAD_SLOTS
+    if _background(priority):
+        # Keep slots free for whatever the listeners are waiting on
+        limit -= config.DOWNLOAD_RESERVED
+    return _state["running"] < max(limit, 1)
+
+
+def _dispatch():
+    """Grant free slots by priority class, round-robin over chats within
+    a class so one long playlist cannot hold every slot."""
+    for priority, chats in enumerate(waiting):
+        while chats and _can_start(priority):
+            chat_id, queue = next(iter(chats.items()))
+            ticket = queue.popleft()
+            if queue:
+                chats.move_to_end(chat_id)
+            else:
+                del chats[chat_id]
+            if ticket["future"].done():
+                continue
+            _state["running"] += 1
+            if not _background(ticket["priority"]):
+                _state["foreground"] += 1
+            ticket["state"] = "running"
+            ticket["future"].set_result(True)
+        if chats:
+            return
+
+
+def _enqueue(ticket: dict):
+    waiting[ticket["priority"]].setdefault(ticket["chat_id"], deque()).append(ticket)
+
+
+def _dequeue(ticket: dict):
+    chats = waiting[ticket["priority"]]
+    queue = chats.get(ticket["chat_id"])
+    if queue is None:
+        return
+    remaining = deque(x for x in queue if x is not ticket)
+    if remaining:
+        chats[ticket["chat_id"]] = remaining
+    else:
+        del chats[ticket["chat_id"]]
+
+
+def _release(ticket: dict):
+    _state["running"] -= 1
+    if not _background(ticket["priority"]):
+        _state["foreground"] -= 1
+    ticket["state"] = "done"
+    _dispatch()
+
+
+def escalate(ticket: dict, priority: int = None):
+    """Raise a waiting or running download to priority, by default the
+    caller's, when a more urgent request comes to depend on it."""
+    if priority is None:
+        priority = current_ticket()["priority"]
+    old = ticket["priority"]
+    if priority >= old:
+        return
+    if ticket["state"] == "waiting":
+        _dequeue(ticket)
+        ticket["priority"] = priority
+        _enqueue(ticket)
+        _dispatch()
+    else:
+        ticket["priority"] = priority
+        if ticket["state"] == "running" and _background(old) and not _background(priority):
+            _state["foreground"] += 1
+    if _background(old) and not _background(priority):
+        ticket["escalated"].set()
+
+
+@asynccontextmanager
+async def download_slot(priority: int = None, chat_id: int = None, ticket: dict = None):
+    """Hold one of the DOWNLOAD_SLOTS global download slots for ticket, or
+    for a new one built from priority and chat."""
+    if ticket is None:
+        ticket = new_ticket(priority, chat_id)
+    future = asyncio.get_running_loop().create_future()
+    ticket["future"] = future
+    ticket["state"] = "waiting"
+    _enqueue(ticket)
+    _dispatch()
+    try:
+        await future
+    except asyncio.CancelledError:
+        if future.done() and not future.cancelled():
+            _release(ticket)
+        else:
+            _dequeue(ticket)
+            ticket["state"] = "done"
+        raise
+    token = download_context.set(ticket)
+    try:
+        yield
+    finally:
+        download_context.reset(token)
+        _release(ticket)
+
+
+def foreground_busy() -> bool:
+    return _state["foreground"] > 0 or any(waiting[NOW_PLAYING]) or any(waiting[NEXT_UP])
+
+
+def background_rate(priority: int = None) -> int:
+    """Bytes/s a download at priority may use right now, 0 for no limit."""
+    if priority is None:
+        priority = current_ticket()["priority"]
+    if not _background(priority) or not foreground_busy():
+        return 0
+    return config.BACKGROUND_RATE * 1024
+
+
+async def throttle(nbytes: int):
+    """Token bucket shared by all background downloads, only enforced while
+    a now-playing or next-up download is running or waiting. Reads the
+    ticket's priority on every call, so an escalated download speeds up
+    at once."""
+    rate = background_rate()
+    if not rate:
+        return
+    now = time.monotonic()
+    _state["tokens"] = min(rate, _state["tokens"] + (now - _state["refilled"]) * rate)
+    _state["refilled"] = now
+    _state["tokens"] -= nbytes
+    if _state["tokens"] < 0:
+        await asyncio.sleep(-_state["tokens"] / rate)
+
+
+def scheduler_status() -> dict:
+    return {
+        "running": _state["running"],
+        "foreground": _state["foreground"],
+        "waiting": {
+            name: sum(len(queue) for queue in waiting[priority].values())
+            for priority, name in enumerate(PRIORITY_NAMES)
+        },
+    }
@@ -1,18 +1,59 @@
 import os
 
-from config import autoclean
+from Alya.utils.mediacache import managed, pin, unpin
+
+# path -> number of queue entries, prefetches and renders using it
+refs = {}
+
+
+def acquire(path):
+    if not path:
+        return
+    key = str(path)
+    count = refs.get(key, 0)
+    refs[key] = count + 1
+    if count == 0:
+        pin(key)
+
+
+def release(path):
+    """Drop one reference. The last one hands media cache files back to its
+    LRU eviction and deletes any other local file."""
+    if not path:
+        return
+    key = str(path)
+    count = refs.get(key, 0)
+    if count > 1:
+        refs[key] = count - 1
+        return
+    if count == 0:
+        return
+    del refs[key]
+    if managed(key):
+        unpin(key)
+    elif os.path.isfile(key):
+        try:
+            os.remove(key)
+        except OSError:
+            pass
+
+
+def set_entry_path(entry, field: str, path):
+    """Point a queue entry's field at path, moving its reference along."""
+    old = entry.get(field)
+    if old == path:
+        return
+    acquire(path)
+    release(old)
+    entry[field] = path
+
+
+def release_entry(entry):
+    if not entry:
+        return
+    for field in ("file", "path", "speed_path"):
+        release(entry.get(field))
 
 
 async def auto_clean(popped):
-    try:
-        rem = popped["file"]
-        autoclean.remove(rem)
-        count = autoclean.count(rem)
-        if count == 0:
-            if "vid_" not in rem or "live_" not in rem or "index_" not in rem:
-                try:
-                    os.remove(rem)
-                except:
-                    pass
-    except:
-        pass
+    release_entry(popped)
@@ -0,0 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import config
+from Alya.utils.exceptions import ChatBusy
+
+mailboxes = {}
+
+
+@asynccontextmanager
+async def chat_lock(chat_id: int):
+    """Serialize queue mutations and stream transitions of one chat.
+
+    Each chat gets its own lock, so a slow transition only delays later
+    transitions of the same chat. At most CHAT_MAILBOX_DEPTH callers may
+    hold or wait on a chat at once; further callers get ChatBusy.
+    """
+    mailbox = mailboxes.get(chat_id)
+    if mailbox is None:
+        mailbox = {"lock": asyncio.Lock(), "depth": 0}
+        mailboxes[chat_id] = mailbox
+    if mailbox["depth"] >= config.CHAT_MAILBOX_DEPTH:
+        raise ChatBusy(chat_id)
+    mailbox["depth"] += 1
+    try:
+        async with mailbox["lock"]:
+            yield
+    finally:
+        mailbox["depth"] -= 1
+        if mailbox["depth"] == 0:
+            mailboxes.pop(chat_id, None)
@@ -0,0 +1,107 @@
+import asyncio
+
+import config
+from Alya import YouTube
+from Alya.logging import LOGGER
+from Alya.misc import db
+from Alya.utils.stream.autoclear import release_entry
+from Alya.utils.stream.prefetch import schedule_prefetch
+from config import time_to_seconds
+
+resolve_tasks = {}
+
+
+def is_lazy(entry: dict) -> bool:
+    return bool(entry.get("lazy"))
+
+
+async def resolve_entry(entry: dict) -> bool:
+    """Fill a lazy entry's title, duration and id in place. Returns False
+    for tracks that cannot be found or are over the duration limit."""
+    if not is_lazy(entry):
+        return not entry.get("unplayable")
+    pending = entry.get("resolving")
+    if pending is None:
+        pending = asyncio.ensure_future(_resolve(entry))
+        entry["resolving"] = pending
+    return await asyncio.shield(pending)
+
+
+async def _resolve(entry: dict) -> bool:
+    try:
+        title, duration_min, duration_sec, thumbnail, vidid = await YouTube.details(
+            entry["query"], not entry.get("spotify")
+        )
+    except Exception as e:
+        LOGGER(__name__).warning(f"Could not resolve {entry['query']}: {e}")
+        title, duration_min, duration_sec, vidid = None, None, 0, None
+    finally:
+        entry.pop("resolving", None)
+    entry["lazy"] = False
+    if not vidid or str(duration_min) == "None" or duration_sec > config.DURATION_LIMIT:
+        entry["unplayable"] = True
+        return False
+    try:
+        seconds = time_to_seconds(duration_min) - 3
+    except:
+        seconds = 0
+    entry.update(
+        {
+            "title": title.title(),
+            "dur": duration_min,
+            "file": f"vid_{vidid}",
+            "vidid": vidid,
+            "seconds": seconds,
+        }
+    )
+    return True
+
+
+async def resolve_head(chat_id: int) -> bool:
+    """Resolve the entry about to play, dropping unplayable ones, so the
+    head of the queue is always a real track. False if none are left."""
+    check = db.get(chat_id)
+    while check and not await resolve_entry(check[0]):
+        release_entry(check.popleft())
+    schedule_resolve(chat_id)
+    return bool(check)
+
+
+async def resolve_range(chat_id: int, start: int, end: int) -> list:
+    """Resolve the entries /queue is about to show and return that page."""
+    page = (db.get(chat_id) or [])[start:end]
+    lazy = [entry for entry in page if is_lazy(entry)]
+    for offset in range(0, len(lazy), config.PLAYLIST_RESOLVE_CONCURRENCY):
+        batch = lazy[offset : offset + config.PLAYLIST_RESOLVE_CONCURRENCY]
+        await asyncio.gather(*(resolve_entry(entry) for entry in batch))
+    return page
+
+
+async def _resolve_ahead(chat_id: int):
+    resolved = False
+    for position in range(config.LAZY_RESOLVE_AHEAD + 1):
+        queue = db.get(chat_id) or []
+        if position >= len(queue):
+            break
+        if is_lazy(queue[position]):
+            await resolve_entry(queue[position])
+            resolved = True
+    if resolved:
+        schedule_prefetch(chat_id)
+
+
+def schedule_resolve(chat_id: int):
+    """Keep the next LAZY_RESOLVE_AHEAD entries resolved in the background."""
+    task = resolve_tasks.get(chat_id)
+    if task and not task.done():
+        return
+    queue = db.get(chat_id) or []
+    if not any(is_lazy(entry) for entry in queue[: config.LAZY_RESOLVE_AHEAD + 1]):
+        return
+    resolve_tasks[chat_id] = asyncio.create_task(_resolve_ahead(chat_id))
+
+
+def cancel_resolve(chat_id: int):
+    task = resolve_tasks.pop(chat_id, None)
+    if task:
+        task.cancel()
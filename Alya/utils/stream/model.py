@@ -0,0 +1,164 @@
+import sys
+from collections import deque
+from itertools import islice
+
+_MISSING = object()
+
+
+class QueueEntry:
+    """One queued track. Slotted to keep long queues small, but read and
+    written like the dicts it replaces: entry["file"], entry.get("speed")."""
+
+    __slots__ = (
+        "title",
+        "dur",
+        "streamtype",
+        "by",
+        "user_id",
+        "chat_id",
+        "file",
+        "vidid",
+        "seconds",
+        "played",
+        "old_dur",
+        "old_second",
+        "speed",
+        "speed_path",
+        "path",
+        "mystic",
+        "markup",
+        "lazy",
+        "query",
+        "spotify",
+        "resolving",
+        "unplayable",
+        "_extra",
+    )
+
+    def __init__(self, **fields):
+        self._extra = None
+        self.update(fields)
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        if key in FIELDS:
+            setattr(self, key, value)
+        else:
+            # Fields added by plugins outside this model
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if self.pop(key, _MISSING) is _MISSING:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        if key in FIELDS:
+            return getattr(self, key, default)
+        if self._extra:
+            return self._extra.get(key, default)
+        return default
+
+    def pop(self, key, default=_MISSING):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        if key in FIELDS:
+            delattr(self, key)
+        else:
+            del self._extra[key]
+        return value
+
+    def update(self, fields=(), **kwargs):
+        for key, value in dict(fields, **kwargs).items():
+            self[key] = value
+
+    def keys(self):
+        return [key for key, _ in self.items()]
+
+    def items(self):
+        items = [
+            (key, getattr(self, key))
+            for key in self.__slots__
+            if key in FIELDS and hasattr(self, key)
+        ]
+        return items + list((self._extra or {}).items())
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"QueueEntry({self.to_dict()!r})"
+
+    def size(self) -> int:
+        """Bytes held by the entry and its plain values; objects it only
+        points at, like the "mystic" message, count as one reference."""
+        total = sys.getsizeof(self)
+        for key, value in self.items():
+            if key == "mystic":
+                continue
+            total += sys.getsizeof(value)
+        if self._extra is not None:
+            total += sys.getsizeof(self._extra)
+        return total
+
+
+FIELDS = frozenset(QueueEntry.__slots__) - {"_extra"}
+
+
+class ChatQueue(deque):
+    """A chat's queue. Keeps the list calls the bot already makes, with
+    pop(0) and insert(0, ...) running in O(1) and slices for /queue."""
+
+    __slots__ = ()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            return list(islice(self, start, stop, step))
+        return super().__getitem__(index)
+
+    def pop(self, index: int = -1):
+        if index == 0:
+            return self.popleft()
+        if index == -1 or index == len(self) - 1:
+            return super().pop()
+        value = self[index]
+        del self[index]
+        return value
+
+    def insert(self, index: int, value):
+        if index == 0:
+            self.appendleft(value)
+        else:
+            super().insert(index, value)
+
+    def memory_report(self) -> dict:
+        entries = [entry for entry in self if isinstance(entry, QueueEntry)]
+        return {
+            "entries": len(self),
+            "bytes": sys.getsizeof(self) + sum(entry.size() for entry in entries),
+            "lazy": sum(1 for entry in entries if entry.get("lazy")),
+            "messages": sum(1 for entry in entries if entry.get("mystic")),
+        }
+
+
+def queue_memory(db: dict) -> dict:
+    """memory_report() of every chat queue, largest first."""
+    reports = {
+        chat_id: queue.memory_report()
+        for chat_id, queue in db.items()
+        if isinstance(queue, ChatQueue)
+    }
+    return dict(sorted(reports.items(), key=lambda x: x[1]["bytes"], reverse=True))
@@ -0,0 +1,90 @@
+import asyncio
+
+import config
+from Alya import YouTube
+from Alya.logging import LOGGER
+from Alya.misc import db
+from Alya.platforms.Youtube import promote_download
+from Alya.utils.scheduler import BULK, PREFETCH
+from Alya.utils.stream.autoclear import acquire, release
+
+prefetch_tasks = {}
+
+
+def _wanted(chat_id: int) -> dict:
+    """(vidid, video) -> priority of the entries to prefetch. Only the next
+    track is PREFETCH; the ones after it download as BULK."""
+    queue = db.get(chat_id) or []
+    wanted = {}
+    for position in range(1, min(len(queue), config.PREFETCH_AHEAD + 1)):
+        entry = queue[position]
+        if "vid_" in str(entry["file"]):
+            key = (entry["vidid"], str(entry["streamtype"]) == "video")
+            wanted.setdefault(key, PREFETCH if position == 1 else BULK)
+    return wanted
+
+
+async def _prefetch(chat_id: int, videoid: str, video: bool, priority: int = PREFETCH):
+    # local=True: in DIRECT_STREAM mode a resolved URL is no use ahead of time,
+    # but a file on disk still saves the next track a stream start
+    file_path, direct = await YouTube.download(
+        videoid,
+        None,
+        videoid=True,
+        video=video,
+        local=True,
+        priority=priority,
+        chat_id=chat_id,
+    )
+    if not direct:
+        return None
+    # Held until the track plays or the prefetch is dropped
+    acquire(file_path)
+    LOGGER(__name__).info(f"Prefetched {videoid} -> {file_path}")
+    return file_path
+
+
+def _drop(task):
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled() and not task.exception():
+        release(task.result())
+
+
+def schedule_prefetch(chat_id: int):
+    """Sync the chat's prefetch jobs with the entries that are next in line,
+    cancelling jobs for tracks that were skipped, shuffled or removed."""
+    if config.PREFETCH_AHEAD <= 0:
+        return
+    wanted = _wanted(chat_id)
+    tasks = prefetch_tasks.setdefault(chat_id, {})
+    for key in list(tasks):
+        if key not in wanted:
+            _drop(tasks.pop(key))
+    for key, priority in wanted.items():
+        if key not in tasks:
+            tasks[key] = asyncio.create_task(_prefetch(chat_id, *key, priority))
+        elif priority == PREFETCH:
+            # Moved up to next in line
+            promote_download(*key, PREFETCH)
+
+
+def cancel_prefetch(chat_id: int):
+    for task in prefetch_tasks.pop(chat_id, {}).values():
+        _drop(task)
+
+
+async def get_prefetched(chat_id: int, videoid: str, video: bool):
+    """The prefetched file, if any. It still holds the prefetch's reference,
+    which the caller releases once the queue entry has taken its own."""
+    task = prefetch_tasks.get(chat_id, {}).pop((videoid, video), None)
+    schedule_prefetch(chat_id)
+    if task is None or task.cancelled():
+        return None
+    # The track is playing now; stop treating its download as background
+    promote_download(videoid, video)
+    try:
+        return await task
+    except Exception as e:
+        LOGGER(__name__).warning(f"Prefetch of {videoid} failed: {e}")
+        return None
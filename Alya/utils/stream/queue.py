@@ -3,7 +3,11 @@ from typing import Union
 
 from Alya.misc import db
 from Alya.utils.formatters import check_duration, seconds_to_min
-from config import autoclean, time_to_seconds
+from Alya.utils.stream.autoclear import acquire
+from Alya.utils.stream.lazy import schedule_resolve
+from Alya.utils.stream.model import ChatQueue, QueueEntry
+from Alya.utils.stream.prefetch import schedule_prefetch
+from config import time_to_seconds
 
 
 async def put_queue(
@@ -23,28 +27,59 @@ async def put_queue(
         duration_in_seconds = time_to_seconds(duration) - 3
     except:
         duration_in_seconds = 0
-    put = {
-        "title": title,
-        "dur": duration,
-        "streamtype": stream,
-        "by": user,
-        "user_id": user_id,
-        "chat_id": original_chat_id,
-        "file": file,
-        "vidid": vidid,
-        "seconds": duration_in_seconds,
-        "played": 0,
-    }
+    put = QueueEntry(
+        title=title,
+        dur=duration,
+        streamtype=stream,
+        by=user,
+        user_id=user_id,
+        chat_id=original_chat_id,
+        file=file,
+        vidid=vidid,
+        seconds=duration_in_seconds,
+        played=0,
+    )
     if forceplay:
         check = db.get(chat_id)
         if check:
             check.insert(0, put)
         else:
-            db[chat_id] = []
+            db[chat_id] = ChatQueue()
             db[chat_id].append(put)
     else:
         db[chat_id].append(put)
-    autoclean.append(file)
+    acquire(file)
+    schedule_prefetch(chat_id)
+
+
+async def put_queue_lazy(
+    chat_id,
+    original_chat_id,
+    query,
+    user,
+    user_id,
+    stream,
+    spotify: Union[bool, str] = None,
+):
+    """Queue a playlist item by its raw query or video id only; title,
+    duration and id are filled in by the lazy resolver before it plays."""
+    put = QueueEntry(
+        title=query,
+        dur="Unknown",
+        streamtype=stream,
+        by=user,
+        user_id=user_id,
+        chat_id=original_chat_id,
+        file=f"lazy_{query}",
+        vidid=None,
+        seconds=0,
+        played=0,
+        lazy=True,
+        query=query,
+        spotify=bool(spotify),
+    )
+    db[chat_id].append(put)
+    schedule_resolve(chat_id)
 
 
 async def put_queue_index(
@@ -69,23 +104,23 @@ async def put_queue_index(
             dur = 0
     else:
         dur = 0
-    put = {
-        "title": title,
-        "dur": duration,
-        "streamtype": stream,
-        "by": user,
-        "chat_id": original_chat_id,
-        "file": file,
-        "vidid": vidid,
-        "seconds": dur,
-        "played": 0,
-    }
+    put = QueueEntry(
+        title=title,
+        dur=duration,
+        streamtype=stream,
+        by=user,
+        chat_id=original_chat_id,
+        file=file,
+        vidid=vidid,
+        seconds=dur,
+        played=0,
+    )
     if forceplay:
         check = db.get(chat_id)
         if check:
             check.insert(0, put)
         else:
-            db[chat_id] = []
+            db[chat_id] = ChatQueue()
             db[chat_id].append(put)
     else:
         db[chat_id].append(put)
@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import config
+from Alya import YouTube
+from Alya.core.call import alya
+from Alya.logging import LOGGER
+from Alya.misc import db
+from Alya.utils.database import (
+    active,
+    delete_queue_snapshot,
+    get_loop,
+    get_queue_snapshots,
+    is_music_playing,
+    music_off,
+    save_queue_snapshot,
+    set_loop,
+    update_queue_snapshot,
+)
+from Alya.utils.scheduler import NEXT_UP
+from Alya.utils.stream.autoclear import acquire, release_entry, set_entry_path
+from Alya.utils.stream.chatlock import chat_lock
+from Alya.utils.stream.lazy import resolve_head
+from Alya.utils.stream.model import ChatQueue, QueueEntry
+from Alya.utils.stream.prefetch import schedule_prefetch
+
+# Runtime-only fields; restored chats play at normal speed from the source
+SKIP_FIELDS = {
+    "mystic",
+    "markup",
+    "resolving",
+    "unplayable",
+    "path",
+    "speed_path",
+    "speed",
+    "old_dur",
+    "old_second",
+}
+
+# chat_id -> (digest of the queue, saved head position, time written)
+_saved = {}
+# Chats with a saved queue that restore_snapshots has not finished with
+_pending = set()
+_state = {"task": None, "restore": None}
+
+
+def _entry_state(entry) -> dict:
+    state = {key: value for key, value in entry.items() if key not in SKIP_FIELDS}
+    if entry.get("old_dur"):
+        state["dur"] = entry["old_dur"]
+        state["seconds"] = entry["old_second"]
+    state["file"] = str(state.get("file"))
+    return state
+
+
+async def _chat_state(chat_id: int):
+    queue = db.get(chat_id)
+    if not queue:
+        return None
+    head = queue[0]
+    entries = [_entry_state(entry) for entry in queue]
+    entries[0]["played"] = int(int(head.get("played") or 0) * float(head.get("speed") or 1.0))
+    return {
+        "chat_id": chat_id,
+        "queue": entries,
+        "loop": await get_loop(chat_id),
+        "playing": bool(await is_music_playing(chat_id)),
+    }
+
+
+def _digest(state: dict) -> str:
+    played = state["queue"][0].pop("played")
+    try:
+        return hashlib.md5(json.dumps(state, sort_keys=True, default=str).encode()).hexdigest()
+    finally:
+        state["queue"][0]["played"] = played
+
+
+async def save_snapshots():
+    """Write the chats whose queue changed since the last pass. When only
+    the playback position moved, just that field is updated."""
+    now = time.time()
+    refresh = config.SNAPSHOT_MAX_AGE * 30
+    for chat_id in list(active):
+        if chat_id in _pending:
+            continue
+        state = await _chat_state(chat_id)
+        if state is None:
+            continue
+        digest = _digest(state)
+        played = state["queue"][0]["played"]
+        saved = _saved.get(chat_id)
+        try:
+            if saved and saved[0] == digest:
+                if saved[1] == played and now - saved[2] < refresh:
+                    continue
+                await update_queue_snapshot(
+                    chat_id, {"queue.0.played": played, "saved_at": now}
+                )
+            else:
+                await save_queue_snapshot(chat_id, {**state, "saved_at": now})
+        except Exception as e:
+            LOGGER(__name__).warning(f"Could not snapshot {chat_id}: {e}")
+            continue
+        _saved[chat_id] = (digest, played, now)
+    for chat_id in [x for x in _saved if x not in active and x not in _pending]:
+        try:
+            await delete_queue_snapshot(chat_id)
+        except Exception as e:
+            LOGGER(__name__).warning(f"Could not drop snapshot of {chat_id}: {e}")
+            continue
+        _saved.pop(chat_id, None)
+
+
+async def _head_link(chat_id: int, entry):
+    file = str(entry["file"])
+    if "live_" in file:
+        n, link = await YouTube.video(entry["vidid"], True)
+        return link if n else None
+    if "vid_" in file:
+        link, _direct = await YouTube.download(
+            entry["vidid"],
+            None,
+            videoid=True,
+            video=str(entry["streamtype"]) == "video",
+            priority=NEXT_UP,
+            chat_id=chat_id,
+        )
+        if link:
+            set_entry_path(entry, "path", link)
+        return link
+    if "index_" in file:
+        return entry["vidid"]
+    return file if os.path.exists(file) else None
+
+
+async def _restore_chat(snapshot: dict) -> bool:
+    chat_id = snapshot["chat_id"]
+    db[chat_id] = ChatQueue(QueueEntry(**entry) for entry in snapshot["queue"])
+    for entry in db[chat_id]:
+        acquire(entry["file"])
+    check = db[chat_id]
+    link = None
+    while await resolve_head(chat_id):
+        link = await _head_link(chat_id, check[0])
+        if link:
+            break
+        release_entry(check.popleft())
+    if not link:
+        return False
+    entry = check[0]
+    file = str(entry["file"])
+    seek = int(entry.get("played") or 0)
+    if "live_" in file or seek >= int(entry.get("seconds") or 0):
+        seek = 0
+    entry["played"] = seek
+    await alya.join_call(
+        chat_id,
+        entry["chat_id"],
+        link,
+        video=True if str(entry["streamtype"]) == "video" else None,
+        vidid=entry["vidid"] if "vid_" in file else None,
+        seek=seek,
+    )
+    await set_loop(chat_id, snapshot.get("loop") or 0)
+    if not snapshot.get("playing", True):
+        await alya.pause_stream(chat_id)
+        await music_off(chat_id)
+    schedule_prefetch(chat_id)
+    return True
+
+
+async def restore_snapshots():
+    """Rejoin the calls saved by the previous run at their saved positions,
+    one chat every RESTORE_DELAY seconds. Snapshots older than
+    SNAPSHOT_MAX_AGE minutes are dropped."""
+    try:
+        snapshots = await get_queue_snapshots()
+    except Exception as e:
+        LOGGER(__name__).error(f"Could not load queue snapshots: {e}")
+        return
+    oldest = time.time() - config.SNAPSHOT_MAX_AGE * 60
+    fresh = [x for x in snapshots if x.get("saved_at", 0) >= oldest]
+    _pending.update(x["chat_id"] for x in fresh)
+    restored = 0
+    for snapshot in fresh:
+        chat_id = snapshot["chat_id"]
+        try:
+            if chat_id in active:
+                continue
+            ok = False
+            try:
+                async with chat_lock(chat_id):
+                    if chat_id in active:
+                        continue
+                    ok = await _restore_chat(snapshot)
+            except Exception as e:
+                LOGGER(__name__).warning(f"Could not restore the queue of {chat_id}: {e}")
+            if ok:
+                restored += 1
+            else:
+                try:
+                    await alya.stop_stream(chat_id)
+                except Exception:
+                    pass
+        finally:
+            _pending.discard(chat_id)
+        await asyncio.sleep(config.RESTORE_DELAY)
+    # Whatever was not restored is dropped on the first snapshot pass
+    for snapshot in snapshots:
+        _saved.setdefault(snapshot["chat_id"], (None, None, 0))
+    LOGGER(__name__).info(f"Restored {restored} of {len(snapshots)} saved queues")
+
+
+async def _save_loop():
+    while True:
+        await asyncio.sleep(config.SNAPSHOT_INTERVAL)
+        try:
+            await save_snapshots()
+        except Exception as e:
+            LOGGER(__name__).error(f"Queue snapshot failed: {e}")
+
+
+def start_snapshots():
+    """Start saving right away; the restore runs beside it, and chats it has
+    not reached yet are neither saved nor dropped."""
+    if config.QUEUE_SNAPSHOTS and _state["task"] is None:
+        _state["task"] = asyncio.create_task(_save_loop())
+        _state["restore"] = asyncio.create_task(restore_snapshots())
+
+
+async def stop_snapshots():
+    if _state["task"] is None:
+        return
+    for name in ("restore", "task"):
+        task = _state[name]
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        _state[name] = None
+    await save_snapshots()
@@ -0,0 +1,93 @@
+import asyncio
+import os
+
+import config
+from Alya.logging import LOGGER
+from Alya.utils.mediacache import register, shard_path, touch
+from Alya.utils.stream.autoclear import acquire, release
+
+PLAYBACK_DIR = os.path.join(os.getcwd(), "playback")
+
+SPEED_PTS = {
+    "0.5": 2.0,
+    "0.75": 1.35,
+    "1.5": 0.68,
+    "2.0": 0.5,
+}
+
+rendering = {}
+
+
+def variant_path(file_path: str, speed) -> str:
+    return shard_path(
+        os.path.join(PLAYBACK_DIR, str(speed)), os.path.basename(file_path)
+    )
+
+
+async def _render(file_path: str, speed, out: str) -> str:
+    root, ext = os.path.splitext(out)
+    temp = f"{root}.part{ext}"
+    proc = await asyncio.create_subprocess_exec(
+        "ffmpeg",
+        "-y",
+        "-i",
+        file_path,
+        "-filter:v",
+        f"setpts={SPEED_PTS[str(speed)]}*PTS",
+        "-filter:a",
+        f"atempo={speed}",
+        temp,
+        stdin=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    # Keep the source on disk until ffmpeg is done with it
+    acquire(file_path)
+    try:
+        await proc.communicate()
+    except asyncio.CancelledError:
+        proc.kill()
+        raise
+    finally:
+        release(file_path)
+        if proc.returncode != 0 and os.path.exists(temp):
+            os.remove(temp)
+    if proc.returncode != 0:
+        raise Exception(f"ffmpeg exited with {proc.returncode} rendering {out}")
+    os.replace(temp, out)
+    return register(out)
+
+
+async def get_speed_variant(file_path: str, speed) -> str:
+    """Return the pre-rendered file for (file, speed), sharing one ffmpeg
+    run between concurrent requests."""
+    out = variant_path(file_path, speed)
+    if os.path.isfile(out):
+        touch(out)
+        return out
+    task = rendering.get(out)
+    if task is None:
+        task = asyncio.create_task(_render(file_path, speed, out))
+        rendering[out] = task
+        task.add_done_callback(lambda _: rendering.pop(out, None))
+    return await asyncio.shield(task)
+
+
+def prerender_variants(file_path: str):
+    if config.SPEED_MODE == "live" or not config.SPEED_PRERENDER:
+        return
+    if not file_path or not os.path.isfile(str(file_path)):
+        return
+    if os.path.exists(f"{file_path}.incomplete"):
+        return
+
+    async def _warm():
+        for speed in SPEED_PTS:
+            try:
+                await get_speed_variant(file_path, speed)
+            except Exception as e:
+                LOGGER(__name__).warning(
+                    f"Speed pre-render of {file_path} at {speed}x failed: {e}"
+                )
+
+    asyncio.create_task(_warm())
+
@@ -1,4 +1,7 @@
+import asyncio
 import os
+from collections import deque
+from contextlib import aclosing
 from random import randint
 from typing import Union
 from pyrogram.types import InlineKeyboardMarkup
@@ -9,10 +12,41 @@ from Alya.core.call import alya
 from Alya.misc import db
 from Alya.utils.database import add_active_video_chat, is_active_chat
 from Alya.utils.exceptions import AssistantErr
+from Alya.utils.fileid_cache import send_photo
 from Alya.utils.inline import aq_markup, close_markup, stream_markup
 from Alya.utils.pastebin import ANNIEBIN
-from Alya.utils.stream.queue import put_queue, put_queue_index
+from Alya.utils.scheduler import NEXT_UP, NOW_PLAYING
+from Alya.utils.stream.model import ChatQueue
+from Alya.utils.stream.queue import put_queue, put_queue_index, put_queue_lazy
 from Alya.utils.thumbnails import get_thumb
+from Alya.utils.tracing import discard_trace, finish_trace, tag_trace, trace_lap
+
+
+async def _resolve_in_order(items, resolve, limit: int):
+    """Yield resolve(item) for each item in input order, keeping up to limit
+    resolutions in flight ahead of the consumer. Failures yield None."""
+    items = iter(items)
+    pending = deque()
+
+    def refill():
+        while len(pending) < limit:
+            item = next(items, StopIteration)
+            if item is StopIteration:
+                return
+            pending.append(asyncio.ensure_future(resolve(item)))
+
+    refill()
+    try:
+        while pending:
+            task = pending.popleft()
+            refill()
+            try:
+                yield await task
+            except Exception:
+                yield None
+    finally:
+        for task in pending:
+            task.cancel()
 
 
 async def stream(
@@ -30,88 +64,125 @@ async def stream(
 ):
     if not result:
         return
+    tag_trace(streamtype)
+    trace_lap("resolve")
     if forceplay:
         await alya.force_stop_stream(chat_id)
     if streamtype == "playlist":
         msg = f"{_['play_19']}\n\n"
         count = 0
-        for search in result:
-            if int(count) == config.PLAYLIST_FETCH_LIMIT:
-                continue
-            try:
+        consumed = 0
+        result = list(result)
+        details = _resolve_in_order(
+            result,
+            lambda search: YouTube.details(search, False if spotify else True),
+            config.PLAYLIST_RESOLVE_CONCURRENCY,
+        )
+        async with aclosing(details):
+            async for resolved in details:
+                if int(count) == config.PLAYLIST_FETCH_LIMIT:
+                    break
+                # Past the summary's head, the rest is queued unresolved
+                if consumed >= config.PLAYLIST_EAGER and await is_active_chat(chat_id):
+                    break
+                consumed += 1
+                if not resolved:
+                    continue
                 (
                     title,
                     duration_min,
                     duration_sec,
                     thumbnail,
                     vidid,
-                ) = await YouTube.details(search, False if spotify else True)
-            except:
-                continue
-            if str(duration_min) == "None":
-                continue
-            if duration_sec > config.DURATION_LIMIT:
-                continue
-            if await is_active_chat(chat_id):
-                await put_queue(
-                    chat_id,
-                    original_chat_id,
-                    f"vid_{vidid}",
-                    title,
-                    duration_min,
-                    user_name,
-                    vidid,
-                    user_id,
-                    "video" if video else "audio",
-                )
-                position = len(db.get(chat_id)) - 1
-                count += 1
-                msg += f"{count}. {title[:70]}\n"
-                msg += f"{_['play_20']} {position}\n\n"
-            else:
-                if not forceplay:
-                    db[chat_id] = []
-                status = True if video else None
-                try:
-                    file_path, direct = await YouTube.download(
-                        vidid, mystic, video=status, videoid=True
+                ) = resolved
+                if str(duration_min) == "None":
+                    continue
+                if duration_sec > config.DURATION_LIMIT:
+                    continue
+                if await is_active_chat(chat_id):
+                    await put_queue(
+                        chat_id,
+                        original_chat_id,
+                        f"vid_{vidid}",
+                        title,
+                        duration_min,
+                        user_name,
+                        vidid,
+                        user_id,
+                        "video" if video else "audio",
                     )
-                except:
-                    raise AssistantErr(_["play_14"])
-                await alya.join_call(
-                    chat_id,
-                    original_chat_id,
-                    file_path,
-                    video=status,
-                    image=thumbnail,
-                )
-                await put_queue(
-                    chat_id,
-                    original_chat_id,
-                    file_path if direct else f"vid_{vidid}",
-                    title,
-                    duration_min,
-                    user_name,
-                    vidid,
-                    user_id,
-                    "video" if video else "audio",
-                    forceplay=forceplay,
-                )
-                img = await get_thumb(vidid)
-                button = stream_markup(_, chat_id)
-                run = await app.send_photo(
-                    original_chat_id,
-                    photo=img,
-                    caption=_["stream_1"].format(
-                        f"https://t.me/{app.username}?start=info_{vidid}",
-                        title[:23],
+                    position = len(db.get(chat_id)) - 1
+                    count += 1
+                    msg += f"{count}. {title[:70]}\n"
+                    msg += f"{_['play_20']} {position}\n\n"
+                else:
+                    if not forceplay:
+                        db[chat_id] = ChatQueue()
+                    status = True if video else None
+                    try:
+                        file_path, direct = await YouTube.download(
+                            vidid, mystic, video=status, videoid=True, chat_id=chat_id
+                        )
+                    except:
+                        raise AssistantErr(_["play_14"])
+                    trace_lap("download")
+                    await alya.join_call(
+                        chat_id,
+                        original_chat_id,
+                        file_path,
+                        video=status,
+                        image=thumbnail,
+                        vidid=vidid,
+                    )
+                    trace_lap("join_call")
+                    await put_queue(
+                        chat_id,
+                        original_chat_id,
+                        file_path if direct else f"vid_{vidid}",
+                        title,
                         duration_min,
                         user_name,
-                    ),
-                    reply_markup=InlineKeyboardMarkup(button),
-                )
-                db[chat_id][0]["mystic"] = run
-                db[chat_id][0]["markup"] = "stream"
+                        vidid,
+                        user_id,
+                        "video" if video else "audio",
+                        forceplay=forceplay,
+                    )
+                    trace_lap("put_queue")
+                    img = await get_thumb(vidid)
+                    trace_lap("thumbnail")
+                    button = stream_markup(_, chat_id)
+                    run = await send_photo(
+                        original_chat_id,
+                        photo=img,
+                        caption=_["stream_1"].format(
+                            f"https://t.me/{app.username}?start=info_{vidid}",
+                            title[:23],
+                            duration_min,
+                            user_name,
+                        ),
+                        reply_markup=InlineKeyboardMarkup(button),
+                    )
+                    db[chat_id][0]["mystic"] = run
+                    finish_trace("send_photo")
+                    db[chat_id][0]["markup"] = "stream"
+        for search in result[consumed:]:
+            if int(count) == config.PLAYLIST_FETCH_LIMIT or not await is_active_chat(chat_id):
+                break
+            await put_queue_lazy(
+                chat_id,
+                original_chat_id,
+                search,
+                user_name,
+                user_id,
+                "video" if video else "audio",
+                spotify=spotify,
+            )
+            position = len(db.get(chat_id)) - 1
+            count += 1
+            msg += f"{count}. {search[:70]}\n"
+            msg += f"{_['play_20']} {position}\n\n"
+        # Only reached first audio if the playlist started the call
+        discard_trace()
         if count == 0:
             return
         else:
@@ -138,10 +209,16 @@ async def stream(
         status = True if video else None
         try:
             file_path, direct = await YouTube.download(
-                vidid, mystic, videoid=True, video=status
+                vidid,
+                mystic,
+                videoid=True,
+                video=status,
+                priority=NEXT_UP if await is_active_chat(chat_id) else NOW_PLAYING,
+                chat_id=chat_id,
             )
         except:
             raise AssistantErr(_["play_14"])
+        trace_lap("download")
         if await is_active_chat(chat_id):
             await put_queue(
                 chat_id,
@@ -155,6 +232,7 @@ async def stream(
                 "video" if video else "audio",
             )
             position = len(db.get(chat_id)) - 1
+            discard_trace()
             button = aq_markup(_, chat_id)
             await app.send_message(
                 chat_id=original_chat_id,
@@ -163,14 +241,16 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                db[chat_id] = ChatQueue()
             await alya.join_call(
                 chat_id,
                 original_chat_id,
                 file_path,
                 video=status,
                 image=thumbnail,
+                vidid=vidid,
             )
+            trace_lap("join_call")
             await put_queue(
                 chat_id,
                 original_chat_id,
@@ -183,9 +263,11 @@ async def stream(
                 "video" if video else "audio",
                 forceplay=forceplay,
             )
+            trace_lap("put_queue")
             img = await get_thumb(vidid)
+            trace_lap("thumbnail")
             button = stream_markup(_, chat_id)
-            run = await app.send_photo(
+            run = await send_photo(
                 original_chat_id,
                 photo=img,
                 caption=_["stream_1"].format(
@@ -197,6 +279,7 @@ async def stream(
                 reply_markup=InlineKeyboardMarkup(button),
             )
             db[chat_id][0]["mystic"] = run
+            finish_trace("send_photo")
             db[chat_id][0]["markup"] = "stream"
     elif streamtype == "soundcloud":
         file_path = result["filepath"]
@@ -215,6 +298,7 @@ async def stream(
                 "audio",
             )
             position = len(db.get(chat_id)) - 1
+            discard_trace()
             button = aq_markup(_, chat_id)
             await app.send_message(
                 chat_id=original_chat_id,
@@ -223,8 +307,9 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                db[chat_id] = ChatQueue()
             await alya.join_call(chat_id, original_chat_id, file_path, video=None)
+            trace_lap("join_call")
             await put_queue(
                 chat_id,
                 original_chat_id,
@@ -237,8 +322,9 @@ async def stream(
                 "audio",
                 forceplay=forceplay,
             )
+            trace_lap("put_queue")
             button = stream_markup(_, chat_id)
-            run = await app.send_photo(
+            run = await send_photo(
                 original_chat_id,
                 photo=config.SOUNCLOUD_IMG_URL,
                 caption=_["stream_1"].format(
@@ -247,6 +333,7 @@ async def stream(
                 reply_markup=InlineKeyboardMarkup(button),
             )
             db[chat_id][0]["mystic"] = run
+            finish_trace("send_photo")
             db[chat_id][0]["markup"] = "tg"
     elif streamtype == "telegram":
         file_path = result["path"]
@@ -267,6 +354,7 @@ async def stream(
                 "video" if video else "audio",
             )
             position = len(db.get(chat_id)) - 1
+            discard_trace()
             button = aq_markup(_, chat_id)
             await app.send_message(
                 chat_id=original_chat_id,
@@ -275,8 +363,9 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                db[chat_id] = ChatQueue()
             await alya.join_call(chat_id, original_chat_id, file_path, video=status)
+            trace_lap("join_call")
             await put_queue(
                 chat_id,
                 original_chat_id,
@@ -289,16 +378,18 @@ async def stream(
                 "video" if video else "audio",
                 forceplay=forceplay,
             )
+            trace_lap("put_queue")
             if video:
                 await add_active_video_chat(chat_id)
             button = stream_markup(_, chat_id)
-            run = await app.send_photo(
+            run = await send_photo(
                 original_chat_id,
                 photo=config.TELEGRAM_VIDEO_URL if video else config.TELEGRAM_AUDIO_URL,
                 caption=_["stream_1"].format(link, title[:23], duration_min, user_name),
                 reply_markup=InlineKeyboardMarkup(button),
             )
             db[chat_id][0]["mystic"] = run
+            finish_trace("send_photo")
             db[chat_id][0]["markup"] = "tg"
     elif streamtype == "live":
         link = result["link"]
@@ -320,6 +411,7 @@ async def stream(
                 "video" if video else "audio",
             )
             position = len(db.get(chat_id)) - 1
+            discard_trace()
             button = aq_markup(_, chat_id)
             await app.send_message(
                 chat_id=original_chat_id,
@@ -328,10 +420,11 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                db[chat_id] = ChatQueue()
             n, file_path = await YouTube.video(link)
             if n == 0:
                 raise AssistantErr(_["str_3"])
+            trace_lap("download")
             await alya.join_call(
                 chat_id,
                 original_chat_id,
@@ -339,6 +432,7 @@ async def stream(
                 video=status,
                 image=thumbnail if thumbnail else None,
             )
+            trace_lap("join_call")
             await put_queue(
                 chat_id,
                 original_chat_id,
@@ -351,9 +445,11 @@ async def stream(
                 "video" if video else "audio",
                 forceplay=forceplay,
             )
+            trace_lap("put_queue")
             img = await get_thumb(vidid)
+            trace_lap("thumbnail")
             button = stream_markup(_, chat_id)
-            run = await app.send_photo(
+            run = await send_photo(
                 original_chat_id,
                 photo=img,
                 caption=_["stream_1"].format(
@@ -365,6 +461,7 @@ async def stream(
                 reply_markup=InlineKeyboardMarkup(button),
             )
             db[chat_id][0]["mystic"] = run
+            finish_trace("send_photo")
             db[chat_id][0]["markup"] = "tg"
     elif streamtype == "index":
         link = result
@@ -382,6 +479,7 @@ async def stream(
                 "video" if video else "audio",
             )
             position = len(db.get(chat_id)) - 1
+            discard_trace()
             button = aq_markup(_, chat_id)
             await mystic.edit_text(
                 text=_["queue_4"].format(position, title[:27], duration_min, user_name),
@@ -389,13 +487,14 @@ async def stream(
             )
         else:
             if not forceplay:
-                db[chat_id] = []
+                db[chat_id] = ChatQueue()
             await alya.join_call(
                 chat_id,
                 original_chat_id,
                 link,
                 video=True if video else None,
             )
+            trace_lap("join_call")
             await put_queue_index(
                 chat_id,
                 original_chat_id,
@@ -407,13 +506,15 @@ async def stream(
                 "video" if video else "audio",
                 forceplay=forceplay,
             )
+            trace_lap("put_queue")
             button = stream_markup(_, chat_id)
-            run = await app.send_photo(
+            run = await send_photo(
                 original_chat_id,
                 photo=config.STREAM_IMG_URL,
                 caption=_["stream_2"].format(user_name),
                 reply_markup=InlineKeyboardMarkup(button),
             )
             db[chat_id][0]["mystic"] = run
+            finish_trace("send_photo")
             db[chat_id][0]["markup"] = "tg"
             await mystic.delete()
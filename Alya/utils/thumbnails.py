@@ -3,12 +3,13 @@ import re
 import textwrap
 
 import aiofiles
-import aiohttp
 from PIL import Image, ImageDraw, ImageEnhance, ImageFilter, ImageFont, ImageOps
 from unidecode import unidecode
-from youtubesearchpython.__future__ import VideosSearch
 
 from Alya import app
+from Alya.platforms.Youtube import search_video
+from Alya.utils.http_client import get_session
+from Alya.utils.mediacache import register, shard_path, touch
 from config import YOUTUBE_IMG_URL
 
 
@@ -31,13 +32,14 @@ def clear(text):
 
 
 async def get_thumb(videoid):
-    if os.path.isfile(f"cache/{videoid}.png"):
-        return f"cache/{videoid}.png"
+    path = shard_path("cache", f"{videoid}.png")
+    if os.path.isfile(path):
+        touch(path)
+        return path
 
     url = f"https://www.youtube.com/watch?v={videoid}"
     try:
-        results = VideosSearch(url, limit=1)
-        for result in (await results.next())["result"]:
+        for result in await search_video(url):
             try:
                 title = result["title"]
                 title = re.sub("\W+", " ", title)
@@ -58,12 +60,11 @@ async def get_thumb(videoid):
             except:
                 channel = "Unknown Channel"
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(thumbnail) as resp:
-                if resp.status == 200:
-                    f = await aiofiles.open(f"cache/thumb{videoid}.png", mode="wb")
-                    await f.write(await resp.read())
-                    await f.close()
+        async with get_session().get(thumbnail) as resp:
+            if resp.status == 200:
+                f = await aiofiles.open(f"cache/thumb{videoid}.png", mode="wb")
+                await f.write(await resp.read())
+                await f.close()
 
         # Load YouTube thumbnail for background
         background = Image.open(f"cache/thumb{videoid}.png").convert("RGBA")
@@ -214,8 +215,8 @@ async def get_thumb(videoid):
         except:
             pass
         
-        background.save(f"cache/{videoid}.png")
-        return f"cache/{videoid}.png"
+        background.save(path)
+        return register(path)
     except Exception as e:
         print(e)
         return YOUTUBE_IMG_URL
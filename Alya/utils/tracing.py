@@ -0,0 +1,238 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from collections import defaultdict, deque
+
+from pyrogram import filters
+
+from Alya import app
+from Alya.misc import SUDOERS, db
+from Alya.utils.placement import get_assistant_loads
+from Alya.utils.ranged import download_stats
+from Alya.utils.scheduler import scheduler_status
+from Alya.utils.stream.model import queue_memory
+from Alya.utils.ytdlp_pool import pool_status
+
+TRACE_WINDOW = 500
+LAG_INTERVAL = 0.5
+
+current_trace = contextvars.ContextVar("play_trace", default=None)
+histograms = defaultdict(lambda: deque(maxlen=TRACE_WINDOW))
+recent = deque(maxlen=TRACE_WINDOW)
+loop_lag = deque(maxlen=TRACE_WINDOW)
+_lag_task = {"task": None}
+
+
+class PlayTrace:
+    def __init__(self, chat_id: int, platform: str):
+        self.chat_id = chat_id
+        self.platform = platform
+        self.streamtype = "unknown"
+        self.started = time.time()
+        self.mark = time.perf_counter()
+        self.origin = self.mark
+        self.phases = []
+
+    def lap(self, phase: str):
+        now = time.perf_counter()
+        self.phases.append((phase, round(now - self.mark, 4)))
+        self.mark = now
+
+    def to_dict(self) -> dict:
+        return {
+            "chat_id": self.chat_id,
+            "platform": self.platform,
+            "streamtype": self.streamtype,
+            "started": self.started,
+            "phases": dict(self.phases),
+            "total": round(self.mark - self.origin, 4),
+        }
+
+
+def platform_of(url) -> str:
+    if not url:
+        return "youtube"
+    for platform in ["youtube", "youtu.be", "spotify", "apple", "resso", "soundcloud"]:
+        if platform in url:
+            return "youtube" if platform == "youtu.be" else platform
+    return "index"
+
+
+def start_trace(chat_id: int, platform: str = "youtube"):
+    """Start tracing a play request; pass the returned token to end_trace
+    when the handler returns, since handlers share long-lived tasks."""
+    return current_trace.set(PlayTrace(chat_id, platform))
+
+
+def end_trace(token):
+    current_trace.reset(token)
+
+
+def discard_trace():
+    """Drop the current trace without recording it, e.g. for a track that
+    was only queued and so never reached first audio."""
+    current_trace.set(None)
+
+
+def tag_trace(streamtype: str = None, platform: str = None):
+    trace = current_trace.get()
+    if trace:
+        if streamtype:
+            trace.streamtype = streamtype
+        if platform:
+            trace.platform = platform
+
+
+def trace_lap(phase: str):
+    trace = current_trace.get()
+    if trace:
+        trace.lap(phase)
+
+
+def finish_trace(phase: str):
+    """Close the current play request once audio has started."""
+    trace = current_trace.get()
+    if not trace:
+        return
+    trace.lap(phase)
+    current_trace.set(None)
+    record = trace.to_dict()
+    recent.append(record)
+    key = (trace.platform, trace.streamtype)
+    for name, duration in trace.phases:
+        histograms[key + (name,)].append(duration)
+    histograms[key + ("total",)].append(record["total"])
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def _monitor_loop_lag():
+    while True:
+        expected = time.perf_counter() + LAG_INTERVAL
+        await asyncio.sleep(LAG_INTERVAL)
+        loop_lag.append(round(max(0.0, time.perf_counter() - expected), 4))
+
+
+def start_lag_monitor():
+    """Sample how late the event loop wakes a fixed-interval sleeper; any
+    blocking call on the loop shows up directly as lag."""
+    if _lag_task["task"] is None:
+        _lag_task["task"] = asyncio.create_task(_monitor_loop_lag())
+
+
+def lag_stats() -> dict:
+    return {
+        "count": len(loop_lag),
+        "p50": percentile(loop_lag, 50),
+        "p95": percentile(loop_lag, 95),
+        "p99": percentile(loop_lag, 99),
+        "max": max(loop_lag, default=0.0),
+    }
+
+
+def transfer_stats() -> dict:
+    stats = list(download_stats)
+    ttfb = [x["ttfb"] for x in stats]
+    throughput = [x["throughput"] for x in stats]
+    return {
+        "count": len(stats),
+        "ttfb_p50": percentile(ttfb, 50),
+        "ttfb_p95": percentile(ttfb, 95),
+        "throughput_p50": percentile(throughput, 50),
+        "resumed": sum(x["resumed"] for x in stats),
+    }
+
+
+def trace_stats() -> dict:
+    stats = {}
+    for (platform, streamtype, phase), values in list(histograms.items()):
+        stats.setdefault(f"{platform}/{streamtype}", {})[phase] = {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+    return stats
+
+
+def trace_report() -> str:
+    lag = lag_stats()
+    text = (
+        f"<b>Event loop lag (s)</b> {lag['p50']} / {lag['p95']} / {lag['p99']}"
+        f", max {lag['max']} (n={lag['count']})\n\n"
+    )
+    slots = scheduler_status()
+    pool = pool_status()
+    transfers = transfer_stats()
+    text += (
+        f"<b>Downloads</b> {slots['running']} running, {slots['foreground']} foreground"
+        f", waiting {' / '.join(str(x) for x in slots['waiting'].values())}"
+        f" ({' / '.join(slots['waiting'])})\n"
+        f"<b>yt-dlp workers</b> {pool['running']} / {pool['workers']} busy"
+        f", {pool['idle']} idle, {pool['waiting']} waiting, {pool['spawned']} spawned\n"
+        f"<b>Ranged downloads</b> ttfb {transfers['ttfb_p50']} / {transfers['ttfb_p95']}s"
+        f", {transfers['throughput_p50']} MB/s, {transfers['resumed']} chunk(s) resumed"
+        f" (n={transfers['count']})\n\n"
+    )
+    loads = get_assistant_loads()
+    if loads:
+        text += "<b>Assistants</b> calls / video / ffmpeg cpu % / failures\n"
+        for assistant, x in sorted(loads.items()):
+            text += (
+                f"  {assistant}: {x['calls']} / {x['video']} / {x['cpu']} / {x['failures']}"
+                f"{' (saturated)' if x['saturated'] else ''}\n"
+            )
+        text += "\n"
+    queues = queue_memory(db)
+    if queues:
+        text += "<b>Largest queues</b>\n"
+        for chat_id, x in list(queues.items())[:5]:
+            text += (
+                f"  {chat_id}: {x['entries']} entries, {x['bytes'] / 1024:.1f} KiB"
+                f", {x['lazy']} lazy\n"
+            )
+        text += "\n"
+    stats = trace_stats()
+    if not stats:
+        return text + "No play requests traced yet."
+    text += "<b>Time to first audio (s) p50 / p95 / p99</b>\n"
+    for group, phases in sorted(stats.items()):
+        text += f"\n<b>{group}</b>\n"
+        for phase, x in phases.items():
+            text += f"  {phase}: {x['p50']} / {x['p95']} / {x['p99']} (n={x['count']})\n"
+    return text
+
+
+def dump_traces(path: str = "cache/play_traces.json") -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "stats": trace_stats(),
+                "loop_lag": lag_stats(),
+                "assistants": get_assistant_loads(),
+                "queues": queue_memory(db),
+                "scheduler": scheduler_status(),
+                "ytdlp_pool": pool_status(),
+                "downloads": list(download_stats),
+                "traces": list(recent),
+            },
+            f,
+            indent=2,
+        )
+    return path
+
+
+@app.on_message(filters.command(["ttfa"]) & SUDOERS)
+async def ttfa_command(client, message):
+    if len(message.command) > 1 and message.command[1] == "dump":
+        return await message.reply_document(dump_traces())
+    await message.reply_text(trace_report())
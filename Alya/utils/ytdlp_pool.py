@@ -0,0 +1,167 @@
+import asyncio
+import json
+import sys
+import time
+
+from yt_dlp.utils import DownloadError
+
+import config
+from Alya.logging import LOGGER
+from Alya.utils.scheduler import background_rate, current_ticket
+
+# Most info dicts are well under this; formats lists can run to a few MB
+RESULT_LIMIT = 64 * 1024 * 1024
+
+# Long-lived worker: one JSON job per stdin line, one JSON result per
+# stdout line. yt-dlp's own output is sent to stderr, which is discarded.
+WORKER = """
+import json, os, sys
+import yt_dlp
+out = os.fdopen(os.dup(1), "w")
+os.dup2(2, 1)
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    job = json.loads(line)
+    try:
+        with yt_dlp.YoutubeDL(job["opts"]) as ydl:
+            info = ydl.extract_info(job["url"], download=job["download"])
+            info = ydl.sanitize_info(info)
+            info["_filename"] = ydl.prepare_filename(info)
+        result = {"ok": True, "info": info}
+    except Exception as e:
+        result = {"ok": False, "error": str(e)}
+    out.write(json.dumps(result) + "\\n")
+    out.flush()
+"""
+
+_pool = {"slots": None, "idle": [], "running": 0, "waiting": 0, "spawned": 0}
+
+
+def _slots() -> asyncio.Semaphore:
+    if _pool["slots"] is None:
+        _pool["slots"] = asyncio.Semaphore(config.YTDLP_WORKERS)
+    return _pool["slots"]
+
+
+async def _spawn():
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable,
+        "-c",
+        WORKER,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        limit=RESULT_LIMIT,
+    )
+    _pool["spawned"] += 1
+    return proc
+
+
+async def _kill(proc):
+    if proc.returncode is None:
+        proc.kill()
+        await proc.wait()
+
+
+async def _checkout():
+    """An idle worker, or a new one if none are left alive."""
+    while _pool["idle"]:
+        proc = _pool["idle"].pop()
+        if proc.returncode is None:
+            return proc
+    return await _spawn()
+
+
+async def extract_info(url: str, opts: dict, download: bool = False, timeout: int = None) -> dict:
+    """YoutubeDL(opts).extract_info(url, download) in a worker process.
+
+    At most YTDLP_WORKERS jobs run at once; a job that outlives its timeout,
+    or whose caller is cancelled, has its process killed. Metadata lookups
+    default to YTDLP_TIMEOUT and downloads to the much longer
+    YTDLP_DOWNLOAD_TIMEOUT. The returned info
+    dict carries the prepared output name under "_filename".
+
+    Background downloads run rate limited. If their ticket is escalated
+    mid-run, the job is restarted without the limit and yt-dlp continues
+    from its .part file."""
+    if not timeout:
+        timeout = config.YTDLP_DOWNLOAD_TIMEOUT if download else config.YTDLP_TIMEOUT
+    rate = background_rate()
+    if download and rate:
+        ticket = current_ticket()
+        job = asyncio.ensure_future(_run_job(url, {**opts, "ratelimit": rate}, download, timeout))
+        escalated = asyncio.ensure_future(ticket["escalated"].wait())
+        try:
+            await asyncio.wait({job, escalated}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            job.cancel()
+            raise
+        finally:
+            escalated.cancel()
+        if job.done():
+            return job.result()
+        job.cancel()
+        await asyncio.wait({job})
+        LOGGER(__name__).info(f"Download of {url} was escalated, resuming it without the rate limit")
+    return await _run_job(url, opts, download, timeout)
+
+
+async def _run_job(url: str, opts: dict, download: bool, timeout: int) -> dict:
+    job = json.dumps({"url": url, "opts": opts, "download": download}).encode()
+    queued = time.perf_counter()
+    _pool["waiting"] += 1
+    try:
+        await _slots().acquire()
+    finally:
+        _pool["waiting"] -= 1
+    _pool["running"] += 1
+    started = time.perf_counter()
+    proc = None
+    line = b""
+    try:
+        proc = await _checkout()
+        proc.stdin.write(job + b"\n")
+        await proc.stdin.drain()
+        line = await asyncio.wait_for(proc.stdout.readline(), timeout)
+    except asyncio.TimeoutError:
+        raise DownloadError(f"yt-dlp timed out after {timeout}s on {url}")
+    finally:
+        if proc is not None:
+            if line and proc.returncode is None:
+                _pool["idle"].append(proc)
+            else:
+                # Timed out, cancelled or died mid-job: recycle the worker
+                await _kill(proc)
+        _pool["running"] -= 1
+        _slots().release()
+    if not line:
+        raise DownloadError(f"yt-dlp worker exited with {proc.returncode}")
+    result = json.loads(line)
+    if not result["ok"]:
+        raise DownloadError(result["error"])
+    LOGGER(__name__).info(
+        f"yt-dlp {'download' if download else 'extract'} of {url} took "
+        f"{round(time.perf_counter() - started, 2)}s "
+        f"(queued {round(started - queued, 2)}s)"
+    )
+    return result["info"]
+
+
+async def close_pool():
+    idle, _pool["idle"] = _pool["idle"], []
+    for proc in idle:
+        if proc.stdin:
+            proc.stdin.close()
+        await _kill(proc)
+
+
+def pool_status() -> dict:
+    return {
+        "workers": config.YTDLP_WORKERS,
+        "running": _pool["running"],
+        "waiting": _pool["waiting"],
+        "idle": len(_pool["idle"]),
+        "spawned": _pool["spawned"],
+    }
@@ -37,21 +37,59 @@ AUTO_LEAVING_ASSISTANT = bool(getenv("AUTO_LEAVING_ASSISTANT", True))
 AUTO_LEAVE_ASSISTANT_TIME = int(getenv("ASSISTANT_LEAVE_TIME", "3600"))
 SERVER_PLAYLIST_LIMIT = int(getenv("SERVER_PLAYLIST_LIMIT", "3000"))
 PLAYLIST_FETCH_LIMIT = int(getenv("PLAYLIST_FETCH_LIMIT", "2500"))
+PLAYLIST_RESOLVE_CONCURRENCY = int(getenv("PLAYLIST_RESOLVE_CONCURRENCY", "8"))
+PLAYLIST_EAGER = int(getenv("PLAYLIST_EAGER", "10"))
+LAZY_RESOLVE_AHEAD = int(getenv("LAZY_RESOLVE_AHEAD", "5"))
 SONG_DOWNLOAD_DURATION = int(getenv("SONG_DOWNLOAD_DURATION", "9999999"))
 SONG_DOWNLOAD_DURATION_LIMIT = int(getenv("SONG_DOWNLOAD_DURATION_LIMIT", "9999999"))
+ASSISTANT_MAX_CALLS = int(getenv("ASSISTANT_MAX_CALLS", "25"))
+ASSISTANT_MAX_FAILURES = int(getenv("ASSISTANT_MAX_FAILURES", "3"))
+ASSISTANT_START_TIMEOUT = int(getenv("ASSISTANT_START_TIMEOUT", "60"))
+FANOUT_TIMEOUT = int(getenv("FANOUT_TIMEOUT", "10"))
+CHAT_MAILBOX_DEPTH = int(getenv("CHAT_MAILBOX_DEPTH", "8"))
+PREFETCH_AHEAD = int(getenv("PREFETCH_AHEAD", "1"))
+SPEED_MODE = getenv("SPEED_MODE", "live")
+MEDIA_CACHE_LIMIT = int(getenv("MEDIA_CACHE_LIMIT", "4096"))
+YTDLP_WORKERS = int(getenv("YTDLP_WORKERS", "2"))
+YTDLP_TIMEOUT = int(getenv("YTDLP_TIMEOUT", "300"))
+YTDLP_DOWNLOAD_TIMEOUT = int(getenv("YTDLP_DOWNLOAD_TIMEOUT", "3600"))
+DIRECT_STREAM = getenv("DIRECT_STREAM", "False") == "True"
+TG_PROGRESSIVE = getenv("TG_PROGRESSIVE", "False") == "True"
+TG_SAFE_PREFIX = int(getenv("TG_SAFE_PREFIX", "2"))
+DOWNLOAD_SLOTS = int(getenv("DOWNLOAD_SLOTS", "4"))
+DOWNLOAD_RESERVED = int(getenv("DOWNLOAD_RESERVED", "1"))
+BACKGROUND_RATE = int(getenv("BACKGROUND_RATE", "512"))
+QUEUE_SNAPSHOTS = getenv("QUEUE_SNAPSHOTS", "True") == "True"
+SNAPSHOT_INTERVAL = int(getenv("SNAPSHOT_INTERVAL", "15"))
+SNAPSHOT_MAX_AGE = int(getenv("SNAPSHOT_MAX_AGE", "30"))
+RESTORE_DELAY = float(getenv("RESTORE_DELAY", "2"))
+SPEED_PRERENDER = getenv("SPEED_PRERENDER", "False") == "True"
+DOWNLOAD_CHUNK_SIZE = int(getenv("DOWNLOAD_CHUNK_SIZE", "4096"))
+DOWNLOAD_CONNECTIONS = int(getenv("DOWNLOAD_CONNECTIONS", "4"))
+DOWNLOAD_SPLIT_SIZE = int(getenv("DOWNLOAD_SPLIT_SIZE", "16"))
+DOWNLOAD_RETRIES = int(getenv("DOWNLOAD_RETRIES", "3"))
 
 SPOTIFY_CLIENT_ID = getenv("SPOTIFY_CLIENT_ID", "22b6125bfe224587b722d6815002db2b")
 SPOTIFY_CLIENT_SECRET = getenv("SPOTIFY_CLIENT_SECRET", "c9c63c6fbf2f467c8bc68624851e9773")
 TG_AUDIO_FILESIZE_LIMIT = int(getenv("TG_AUDIO_FILESIZE_LIMIT", "5242880000"))
 TG_VIDEO_FILESIZE_LIMIT = int(getenv("TG_VIDEO_FILESIZE_LIMIT", "5242880000"))
 
-STRING1 = getenv("STRING_SESSION" ,"BQG8AHcARrMsnSYij7yTk209tBma95rskuFV9JccDI7_xHxRGT59be7W9uzRlk6dLSWi2qQiSHoy-yR6nGcEDMUF2a7r2rT-YTwrn_nSzZwevYU6wtIOzmKNuJfi3v-IFH7YqLYKTOJ8Gvrw2Fa1JpL1OGEyl6oCjteTr9BIt9sabcq6LewYIAo5VTcRtujXpzLODBvTRxkPO0ZsP24ZAHkmNTCcqAm1nIMGArBdeuh-3-b80OVI2CjrUpUsLA8JTlV1TCc6tNjDk5zxfe9cHqlWBoyYwv-MFiYX1bHPFk8XrrH4YO7RIu9SJ8grGjOFyDbxAPFS4t9d6B1ylFF8SrSlBnKJvQAAAAFIn-xqAA") 
-STRING2 = getenv("STRING_SESSION2", None)
+STRING1 = getenv("STRING_SESSION1", getenv("STRING_SESSION" ,"BQG8AHcARrMsnSYij7yTk209tBma95rskuFV9JccDI7_xHxRGT59be7W9uzRlk6dLSWi2qQiSHoy-yR6nGcEDMUF2a7r2rT-YTwrn_nSzZwevYU6wtIOzmKNuJfi3v-IFH7YqLYKTOJ8Gvrw2Fa1JpL1OGEyl6oCjteTr9BIt9sabcq6LewYIAo5VTcRtujXpzLODBvTRxkPO0ZsP24ZAHkmNTCcqAm1nIMGArBdeuh-3-b80OVI2CjrUpUsLA8JTlV1TCc6tNjDk5zxfe9cHqlWBoyYwv-MFiYX1bHPFk8XrrH4YO7RIu9SJ8grGjOFyDbxAPFS4t9d6B1ylFF8SrSlBnKJvQAAAAFIn-xqAA"))
 STRING2 = getenv("STRING_SESSION2", None)
 STRING3 = getenv("STRING_SESSION3", None)
 STRING4 = getenv("STRING_SESSION4", None)
 STRING5 = getenv("STRING_SESSION5", None)
 
+STRING_SESSIONS = {}
+for _key, _value in os.environ.items():
+    _match = re.fullmatch(r"STRING_SESSION(\d+)", _key)
+    if _match and _value:
+        STRING_SESSIONS[int(_match.group(1))] = _value
+for _number, _value in enumerate([STRING1, STRING2, STRING3, STRING4, STRING5], 1):
+    if _value:
+        STRING_SESSIONS[_number] = _value
+STRING_SESSIONS = dict(sorted(STRING_SESSIONS.items()))
+
 
 AYU = [
     "💞", "🦋", "🔍", "🧪", "🦋", "⚡️", "🔥", "🦋", "🎩", "🌈", "🍷", "🥂", "🦋", "🥃", "🥤", "🕊️",
@@ -65,7 +103,6 @@ BANNED_USERS = filters.user()
 adminlist = {}
 lyrical = {}
 votemode = {}
-autoclean = []
 confirmer = {}
 
 START_IMG_URL = getenv(